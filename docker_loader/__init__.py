@@ -1,16 +1,62 @@
-from docker_loader.builder import Builder
-from docker_loader.container import Container
-from docker_loader.image import Image
-from docker_loader.image_definition import ImageDefinition
-from docker_loader.provisioner import Provisioner
-from docker_loader.shortcuts import build
+import sys
+import importlib
+
+
+# Public names and the modules defining them. They are imported on first
+# access, so that importing a single module of the package, such as an image
+# definition, does not load the Docker client.
+EXPORTS = {
+    'Builder': 'docker_loader.builder',
+    'BuildCache': 'docker_loader.cache',
+    'BuildReport': 'docker_loader.report',
+    'Container': 'docker_loader.container',
+    'ContainerPool': 'docker_loader.pool',
+    'Image': 'docker_loader.image',
+    'ImageDefinition': 'docker_loader.image_definition',
+    'Provisioner': 'docker_loader.provisioner',
+    'ValidationError': 'docker_loader.validation',
+    'build': 'docker_loader.shortcuts',
+    'build_all': 'docker_loader.shortcuts',
+    'save_images': 'docker_loader.image',
+}
 
 
 __all__ = (
     'Builder',
+    'BuildCache',
+    'BuildReport',
     'Container',
+    'ContainerPool',
     'Image',
     'ImageDefinition',
     'Provisioner',
+    'ValidationError',
     'build',
+    'build_all',
+    'save_images',
 )
+
+
+def load(name):
+    value = getattr(importlib.import_module(EXPORTS[name]), name)
+    globals()[name] = value
+    return value
+
+
+if sys.version_info >= (3, 7):
+
+    def __getattr__(name):
+        if name not in EXPORTS:
+            raise AttributeError(
+                "module {!r} has no attribute {!r}".format(__name__, name)
+            )
+        return load(name)
+
+    def __dir__():
+        return sorted(set(globals()) | set(EXPORTS))
+
+else:
+    # Module attribute hooks are not supported, import everything upfront.
+    for name in EXPORTS:
+        load(name)
+    del name
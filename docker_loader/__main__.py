@@ -0,0 +1,6 @@
+import sys
+
+from docker_loader.cli import main
+
+
+sys.exit(main())
@@ -0,0 +1,289 @@
+"""
+asyncio interface to builds and containers. Requires Python 3.5 or newer.
+
+Docker API calls are blocking, so they are run on a thread pool shared by
+all builds, limiting the number of threads regardless of how many builds
+the event loop drives.
+"""
+
+import json
+import asyncio
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from docker_loader.builder import Builder
+from docker_loader.container import Container, ContainerCommandError
+from docker_loader.report import BuildReport
+from docker_loader.utils import DockerError, pull_image
+
+
+DEFAULT_WORKERS = 32
+
+executor_lock = threading.Lock()
+shared_executor = None
+
+
+def default_executor():
+    global shared_executor
+    with executor_lock:
+        if shared_executor is None:
+            shared_executor = ThreadPoolExecutor(max_workers=DEFAULT_WORKERS)
+        return shared_executor
+
+
+def submit(loop, executor, function, *args, **kwargs):
+    return loop.run_in_executor(
+        executor,
+        functools.partial(function, *args, **kwargs)
+    )
+
+
+class EventStream:
+    """
+    Async iterator over items put into it from any thread, ending once it
+    is closed.
+    """
+
+    END = object()
+
+    def __init__(self, loop):
+        self.loop = loop
+        self.queue = asyncio.Queue()
+
+    def put(self, item):
+        self.loop.call_soon_threadsafe(self.queue.put_nowait, item)
+
+    def close(self):
+        self.put(self.END)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        item = await self.queue.get()
+        if item is self.END:
+            self.queue.put_nowait(self.END)
+            raise StopAsyncIteration()
+        return item
+
+
+class ProgressEvents:
+    """Forwards pull progress messages to an EventStream."""
+
+    def __init__(self, events):
+        self.events = events
+
+    def consume(self, stream, prefix=None):
+        for line in stream:
+            message = json.loads(line)
+            self.events.put(('progress', dict(message, image=prefix)))
+            if 'error' in message:
+                raise DockerError(message['error'])
+
+
+class CommandOutput(EventStream):
+    """
+    Async iterator over tuples of stream and text output by a command.
+    Awaiting ``result`` returns its exit code, stdout and stderr.
+    """
+
+    def __init__(self, loop):
+        EventStream.__init__(self, loop)
+        self.future = None
+
+    async def result(self):
+        return await self.future
+
+
+class AsyncContainer:
+    """
+    Wraps a Container, running its blocking calls on the executor. The
+    container is removed when leaving the ``async with`` block, also when
+    the enclosing task is cancelled. An existing Container may be given to
+    wrap instead of creating one.
+    """
+
+    def __init__(self, client, image, executor=None, loop=None,
+            container=None, **container_configuration):
+        self.loop = loop or asyncio.get_event_loop()
+        self.executor = executor or default_executor()
+        if container is None:
+            container = Container(client, image, **container_configuration)
+        self.container = container
+
+    def __str__(self):
+        return str(self.container)
+
+    async def __aenter__(self):
+        await self.create()
+        return self
+
+    async def __aexit__(self, *args, **kwargs):
+        await self.remove()
+
+    def submit(self, function, *args, **kwargs):
+        return submit(self.loop, self.executor, function, *args, **kwargs)
+
+    async def create(self):
+        future = self.submit(self.container.create)
+        try:
+            await asyncio.shield(future)
+        except asyncio.CancelledError:
+            # Creation finishes in its thread regardless, remove the
+            # container once it does.
+            future.add_done_callback(
+                lambda future: self.submit(self.container.remove)
+            )
+            raise
+
+    async def remove(self):
+        # Shielded, so that removal completes even if the task is cancelled.
+        await asyncio.shield(self.submit(self.container.remove))
+
+    async def execute(self, script, stdin=None, output=None,
+            **additional_configuration):
+        return await self.submit(
+            self.container.execute,
+            script,
+            stdin=stdin,
+            output=output,
+            **additional_configuration
+        )
+
+    def stream(self, script, stdin=None, **additional_configuration):
+        """
+        Starts the script, returning a CommandOutput to iterate over its
+        output as it is produced.
+        """
+        output = CommandOutput(self.loop)
+        output.future = self.submit(
+            self.container.execute,
+            script,
+            stdin=stdin,
+            output=lambda stream, data: output.put((stream, data)),
+            **additional_configuration
+        )
+        output.future.add_done_callback(lambda future: output.close())
+        return output
+
+    async def run(self, command, **additional_configuration):
+        exit_code, stdout, stderr = await self.execute(
+            command,
+            **additional_configuration
+        )
+        if exit_code != 0:
+            raise ContainerCommandError(command, exit_code, stdout, stderr)
+        return stdout, stderr
+
+    async def put_archive(self, path, data):
+        await self.submit(self.container.put_archive, path, data)
+
+    async def fetch_file(self, path, destination):
+        await self.submit(self.container.fetch_file, path, destination)
+
+
+class AsyncBuilder:
+    """
+    Runs a build on the event loop, taking the same options as Builder.
+    ``events`` is an async iterator over tuples of event kind and details:
+    ``'progress'`` messages of the base image pull, ``'step'`` dictionaries
+    of finished build steps, as recorded by BuildReport, and with
+    ``stream_output`` set, ``'output'`` tuples of stream and text of
+    provisioning commands. Events are queued until read, so output should
+    only be streamed if they are.
+    """
+
+    def __init__(self, client, image_definition, executor=None, loop=None,
+            stream_output=False, **builder_options):
+        self.loop = loop or asyncio.get_event_loop()
+        self.executor = executor or default_executor()
+        self.events = EventStream(self.loop)
+        self.stream_output = stream_output
+        report = builder_options.get('report') or BuildReport()
+        report.add_hook(lambda step: self.events.put(('step', step)))
+        builder_options['report'] = report
+        self.builder = Builder(client, image_definition, **builder_options)
+
+    def submit(self, function, *args, **kwargs):
+        return submit(self.loop, self.executor, function, *args, **kwargs)
+
+    async def pull(self):
+        await self.submit(
+            self.builder.pull,
+            progress=ProgressEvents(self.events)
+        )
+
+    async def commit(self, container):
+        return await self.submit(self.builder.commit, container.container)
+
+    async def run(self, **additional_configuration):
+        builder = self.builder
+        try:
+            if self.stream_output:
+                additional_configuration.setdefault(
+                    'output',
+                    lambda stream, data: self.events.put(
+                        ('output', (stream, data))
+                    )
+                )
+            configuration = await self.submit(
+                builder.prepare,
+                additional_configuration,
+                progress=ProgressEvents(self.events)
+            )
+            fingerprint = await self.submit(builder.fingerprint)
+            indexed = await self.submit(builder.lookup, fingerprint)
+            if indexed is not None:
+                return indexed
+            image, cached = await self.submit(builder.resume)
+            container = await self.submit(
+                builder.container,
+                image,
+                configuration
+            )
+            async with AsyncContainer(
+                    builder.client,
+                    image,
+                    executor=self.executor,
+                    loop=self.loop,
+                    container=container) as container:
+                image = await self.submit(
+                    builder.build,
+                    container.container,
+                    image,
+                    cached=cached
+                )
+            await self.submit(builder.store, fingerprint, image)
+            return image
+        finally:
+            builder.skip()
+            self.events.close()
+
+
+async def pull(client, image, events=None, executor=None):
+    """
+    Pulls the image. Progress messages are put into the given EventStream,
+    or printed if it is not given.
+    """
+    loop = asyncio.get_event_loop()
+    await submit(
+        loop,
+        executor or default_executor(),
+        pull_image,
+        client,
+        image,
+        progress=(ProgressEvents(events) if events is not None else None)
+    )
+
+
+async def save(image, path, executor=None, **options):
+    """Saves the image like Image.save, without blocking the event loop."""
+    loop = asyncio.get_event_loop()
+    return await submit(
+        loop,
+        executor or default_executor(),
+        image.save,
+        path,
+        **options
+    )
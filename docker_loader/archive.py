@@ -0,0 +1,149 @@
+import os
+import stat
+import fnmatch
+import tarfile
+
+
+BLOCK_SIZE = tarfile.BLOCKSIZE
+
+
+def matches(path, patterns):
+    name = os.path.basename(path)
+    return any(
+        fnmatch.fnmatchcase(path, pattern) or
+        fnmatch.fnmatchcase(name, pattern)
+        for pattern in patterns
+    )
+
+
+def join_relative(directory, name):
+    if directory:
+        return directory + '/' + name
+    return name
+
+
+def collect_files(source, include=None, exclude=None):
+    """
+    Walks the source directory, yielding tuples of path relative to source
+    using forward slashes, host path and the result of ``os.lstat`` for each
+    directory and file. Glob patterns are matched against both the relative
+    path and the base name. Excluded directories are not descended into;
+    include patterns apply to files only.
+    """
+    exclude = exclude or ()
+    for directory, directories, files in os.walk(source):
+        relative_directory = os.path.relpath(directory, source)
+        if relative_directory == os.curdir:
+            relative_directory = ''
+        else:
+            relative_directory = relative_directory.replace(os.sep, '/')
+        kept = []
+        for name in sorted(directories):
+            relative_path = join_relative(relative_directory, name)
+            if matches(relative_path, exclude):
+                continue
+            path = os.path.join(directory, name)
+            stat_result = os.lstat(path)
+            if stat.S_ISLNK(stat_result.st_mode):
+                # Symbolic links to directories are archived as links.
+                files.append(name)
+                continue
+            kept.append(name)
+            yield relative_path, path, stat_result
+        directories[:] = kept
+        for name in sorted(files):
+            relative_path = join_relative(relative_directory, name)
+            if matches(relative_path, exclude):
+                continue
+            if include is not None and not matches(relative_path, include):
+                continue
+            path = os.path.join(directory, name)
+            yield relative_path, path, os.lstat(path)
+
+
+def tar_info(name, path, stat_result, owner=(0, 0)):
+    info = tarfile.TarInfo(name)
+    info.mode = stat.S_IMODE(stat_result.st_mode)
+    info.mtime = stat_result.st_mtime
+    info.uid, info.gid = owner
+    if stat.S_ISDIR(stat_result.st_mode):
+        info.type = tarfile.DIRTYPE
+    elif stat.S_ISLNK(stat_result.st_mode):
+        info.type = tarfile.SYMTYPE
+        info.linkname = os.readlink(path)
+    elif stat.S_ISREG(stat_result.st_mode):
+        info.type = tarfile.REGTYPE
+        info.size = stat_result.st_size
+    else:
+        return None
+    return info
+
+
+def iter_tar(entries, owner=(0, 0), chunk_size=1024 * 1024):
+    """
+    Generates a tar archive of the given entries, tuples of archive name,
+    host path and stat result, reading files from disk in chunks as the
+    archive is consumed. Sockets, devices and pipes are skipped.
+    """
+    for name, path, stat_result in entries:
+        info = tar_info(name, path, stat_result, owner)
+        if info is None:
+            continue
+        yield info.tobuf(tarfile.PAX_FORMAT, 'utf-8', 'surrogateescape')
+        if info.type != tarfile.REGTYPE:
+            continue
+        remaining = info.size
+        with open(path, 'rb') as input_file:
+            while remaining:
+                chunk = input_file.read(min(chunk_size, remaining))
+                if not chunk:
+                    # File was truncated after stat, keep the header valid.
+                    chunk = b'\0' * remaining
+                remaining -= len(chunk)
+                yield chunk
+        padding = -info.size % BLOCK_SIZE
+        if padding:
+            yield b'\0' * padding
+    yield b'\0' * (2 * BLOCK_SIZE)
+
+
+def member_name(name):
+    while name.startswith('./'):
+        name = name[2:]
+    return name.strip('/')
+
+
+def copy_stream(source, output, chunk_size=1024 * 1024):
+    copied = 0
+    for chunk in iter(lambda: source.read(chunk_size), b''):
+        output.write(chunk)
+        copied += len(chunk)
+    return copied
+
+
+def extract_members(stream, destinations, chunk_size=1024 * 1024):
+    """
+    Reads a tar archive from a file-like stream in a single pass, writing
+    contents of regular file members named in destinations to the
+    corresponding path or file-like object. Returns the set of extracted
+    names.
+    """
+    destinations = dict(
+        (member_name(name), destination)
+        for name, destination in destinations.items()
+    )
+    extracted = set()
+    with tarfile.open(fileobj=stream, mode='r|') as archive:
+        for member in archive:
+            name = member_name(member.name)
+            destination = destinations.get(name)
+            if destination is None or not member.isfile():
+                continue
+            source = archive.extractfile(member)
+            if hasattr(destination, 'write'):
+                copy_stream(source, destination, chunk_size)
+            else:
+                with open(destination, 'wb') as output:
+                    copy_stream(source, output, chunk_size)
+            extracted.add(name)
+    return extracted
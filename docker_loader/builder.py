@@ -1,53 +1,290 @@
 import sys
+import json
 import logging
 
+import six
+
 from docker_loader.container import Container
 from docker_loader.image import Image
-from docker_loader.utils import pull_image
+from docker_loader.report import NULL_REPORT
+from docker_loader.utils import DockerError, pull_image
 
 
 logger = logging.getLogger(__name__)
 
 
+class BuildError(Exception):
+    pass
+
+
+def dockerfile_string(value):
+    return json.dumps(value).replace('$', '\\$')
+
+
+def config_changes(config):
+    """
+    Translates image configuration into Dockerfile instructions accepted by
+    the image import API.
+    """
+    changes = []
+    for variable in config.get('Env') or ():
+        name, _, value = variable.partition('=')
+        changes.append('ENV {}={}'.format(name, dockerfile_string(value)))
+    if config.get('ExposedPorts'):
+        changes.append('EXPOSE {}'.format(
+            ' '.join(sorted(config['ExposedPorts']))
+        ))
+    if config.get('Volumes'):
+        changes.append('VOLUME {}'.format(
+            json.dumps(sorted(config['Volumes']))
+        ))
+    if config.get('Labels'):
+        changes.append('LABEL {}'.format(' '.join(
+            '{}={}'.format(dockerfile_string(key), dockerfile_string(value))
+            for key, value in sorted(config['Labels'].items())
+        )))
+    if config.get('User'):
+        changes.append('USER {}'.format(config['User']))
+    if config.get('WorkingDir'):
+        changes.append('WORKDIR {}'.format(config['WorkingDir']))
+    if config.get('StopSignal'):
+        changes.append('STOPSIGNAL {}'.format(config['StopSignal']))
+    for instruction in config.get('OnBuild') or ():
+        changes.append('ONBUILD {}'.format(instruction))
+    for key, instruction in (('Entrypoint', 'ENTRYPOINT'), ('Cmd', 'CMD')):
+        command = config.get(key)
+        if isinstance(command, six.string_types):
+            command = [command]
+        if command:
+            changes.append('{} {}'.format(instruction, json.dumps(command)))
+    return changes
+
+
+def import_result(result):
+    """Returns the image id from the import API's progress output."""
+    status = None
+    for line in result.splitlines():
+        if not line.strip():
+            continue
+        message = json.loads(line)
+        if 'error' in message:
+            raise DockerError(message['error'])
+        status = message.get('status', status)
+    return status
+
+
+def total_size(inspection):
+    """
+    Returns the image's size including its parents, which daemons no longer
+    reporting ``VirtualSize`` give as ``Size``, or None.
+    """
+    return inspection.get('VirtualSize', inspection.get('Size'))
+
+
 class Builder:
 
     DEFAULT_COMMAND = '/bin/sh'
 
-    def __init__(self, client, image_definition):
+    def __init__(self, client, image_definition, cache=None, pull_base=None,
+            puller=None, report=None, squash=None, pool=None, index=None):
         self.client = client
+        self.pool = pool
+        self.index = index
         self.definition = image_definition
+        self.cache = cache
+        self.cache_context = None
+        self.unstarted = list(image_definition.provisioners)
+        self.puller = puller
+        self.report = report or NULL_REPORT
+        if pull_base is None:
+            pull_base = image_definition.pull_base
+        self.pull_base = pull_base
+        if squash is None:
+            squash = image_definition.squash
+        self.squash = squash
 
     def run(self, **additional_configuration):
+        try:
+            container_configuration = self.prepare(additional_configuration)
+            fingerprint = self.fingerprint()
+            indexed = self.lookup(fingerprint)
+            if indexed is not None:
+                return indexed
+            image, cached = self.resume()
+            with self.container(image, container_configuration) as container:
+                image = self.build(container, image, cached=cached)
+            self.store(fingerprint, image)
+            return image
+        finally:
+            self.skip()
+
+    def skip(self, count=None):
+        """
+        Tells the first ``count`` of provisioners not started yet, or all of
+        them, that the build will not run them.
+        """
+        if count is None:
+            count = len(self.unstarted)
+        skipped = self.unstarted[:count]
+        del self.unstarted[:count]
+        for provisioner in skipped:
+            provisioner.skip()
+
+    def prepare(self, additional_configuration=None, progress=None):
+        """
+        Validates the definition and pulls the base image if needed. Returns
+        the build container's configuration.
+        """
         self.definition.validate()
-        container_args = (
-            self.client,
-            self.definition.base,
+        container_configuration = self.container_configuration(
+            additional_configuration
         )
-        container_kwargs = {
-            'build_volumes': self.definition.build_volumes,
+        if self.pull_base:
+            self.pull(progress)
+        return container_configuration
+
+    def fingerprint(self):
+        """Returns the build's fingerprint in the index, if there is one."""
+        if self.index is None:
+            return None
+        return self.index.fingerprint(
+            self.definition,
+            self.client.inspect_image(self.definition.base)['Id'],
+            squash=self.squash
+        )
+
+    def lookup(self, fingerprint):
+        """Returns the previously built image, if nothing changed since."""
+        if fingerprint is None:
+            return None
+        indexed = self.index.lookup(self.client, fingerprint)
+        if indexed is None:
+            return None
+        logger.info("Nothing changed, using image {}.".format(indexed[:12]))
+        self.skip()
+        return Image(self.client, indexed, report=self.report)
+
+    def store(self, fingerprint, image):
+        if fingerprint is not None:
+            self.index.store(
+                fingerprint,
+                image.id,
+                type(self.definition).__name__
+            )
+
+    def container(self, image, container_configuration):
+        """
+        Returns the build container, taken from the pool if there is one.
+        """
+        if self.pool is not None:
+            return self.pool.acquire(image, **container_configuration)
+        return Container(self.client, image, **container_configuration)
+
+    def build(self, container, parent, cached=0):
+        """
+        Provisions the container and commits it, returning the built image.
+        """
+        self.provision(container, cached=cached, parent=parent)
+        image = self.commit(container)
+        if self.squash:
+            image = self.flatten(container, image)
+        return image
+
+    def container_configuration(self, additional_configuration=None):
+        configuration = {
+            'build_volumes': self.build_volumes(),
             'build_volumes_from': self.definition.build_volumes_from,
             'environment': self.definition.environment,
             'entrypoint': self.definition.entry_point,
             'hostname': self.definition.hostname,
             'domainname': self.definition.domainname,
+            'report': self.report,
         }
-        container_kwargs.update(additional_configuration)
-        if self.definition.pull_base:
-            pull_image(self.client, self.definition.base)
-        with Container(*container_args, **container_kwargs) as container:
-            self.provision(container)
-            return self.commit(container)
-
-    def provision(self, container):
+        configuration.update(additional_configuration or {})
+        return configuration
+
+    def pull(self, progress=None):
+        with self.report.measure('pull', image=self.definition.base):
+            if self.puller is not None:
+                self.puller.pull(self.definition.base)
+            else:
+                pull_image(self.client, self.definition.base, progress)
+
+    def build_volumes(self):
+        volumes = dict(self.definition.build_volumes)
+        for provisioner in self.definition.provisioners:
+            volumes.update(provisioner.build_volumes(self.definition))
+        return volumes
+
+    def resume(self):
+        """
+        Finds the longest prefix of provisioners with cached results. Returns
+        the image to start the build from and the length of that prefix.
+        """
+        if self.cache is None:
+            return self.definition.base, 0
+        image = self.client.inspect_image(self.definition.base)['Id']
+        cached = 0
+        for provisioner in self.definition.provisioners:
+            cached_image = self.cache.lookup(
+                self.client,
+                self.cache_key(image, provisioner)
+            )
+            if cached_image is None:
+                break
+            logger.info("Using cached image {image} for: {step}".format(
+                image=cached_image[:12],
+                step=provisioner
+            ))
+            image = cached_image
+            cached += 1
+        self.skip(cached)
+        return image, cached
+
+    def cache_key(self, parent, provisioner):
+        if self.cache_context is None:
+            self.cache_context = self.cache.context(self.definition)
+        return self.cache.key(parent, provisioner, self.cache_context)
+
+    def provision(self, container, cached=0, parent=None):
         try:
-            for provisioner in self.definition.provisioners:
+            provisioners = self.definition.provisioners
+            for provisioner in provisioners[cached:]:
+                if provisioner in self.unstarted:
+                    self.unstarted.remove(provisioner)
                 logger.info("Provisioning: {}".format(provisioner))
-                provisioner.provision(container)
+                with self.report.measure(
+                    'provision',
+                    provisioner=str(provisioner)
+                ):
+                    provisioner.provision(container)
+                if self.cache is not None:
+                    parent = self.commit_step(container, parent, provisioner)
             for provisioner in reversed(self.definition.provisioners):
-                provisioner.cleanup(container)
+                with self.report.measure(
+                    'cleanup',
+                    provisioner=str(provisioner)
+                ):
+                    provisioner.cleanup(container)
         except Exception as error:
             logger.error(str(error))
-            sys.exit(1)
+            six.reraise(
+                BuildError,
+                BuildError(str(error)),
+                sys.exc_info()[2]
+            )
+
+    def commit_step(self, container, parent, provisioner):
+        key = self.cache_key(parent, provisioner)
+        with self.report.measure(
+            'commit_step',
+            provisioner=str(provisioner)
+        ) as step:
+            image = self.client.commit(container.id)['Id']
+            step.update(self.image_size(image, parent))
+        self.cache.store(key, parent, image, str(provisioner))
+        logger.info("Cached step as image {}.".format(image[:12]))
+        return image
 
     def commit(self, container, additional_configuration=None):
         base_config = self.client.inspect_image(self.definition.base)
@@ -84,14 +321,69 @@ class Builder:
             config['Labels'] = self.definition.labels
         if additional_configuration is not None:
             config.update(additional_configuration)
-        result = self.client.commit(
-            container.id,
-            author=self.definition.maintainer,
-            conf=config
-        )
-        image = Image(self.client, result['Id'])
+        with self.report.measure('commit') as step:
+            result = self.client.commit(
+                container.id,
+                author=self.definition.maintainer,
+                conf=config
+            )
+            step.update(self.image_size(result['Id'], self.definition.base))
+        image = Image(self.client, result['Id'], report=self.report)
         logger.info("Commited container {container} to image {image}.".format(
             container=container,
             image=image
         ))
         return image
+
+    def flatten(self, container, image):
+        """
+        Exports the container's filesystem and imports it as a single layer
+        image with the committed image's configuration, which replaces it.
+        """
+        logger.info("Squashing image {}...".format(image))
+        config = self.client.inspect_image(image.id)
+        with self.report.measure('squash') as step:
+            stream = self.client.export(container.id)
+            try:
+                result = self.client.import_image(
+                    src=stream,
+                    changes=config_changes(config['Config']),
+                    stream_src=True
+                )
+            finally:
+                stream.close()
+            squashed_id = import_result(result)
+            size = total_size(config)
+            squashed_size = total_size(self.client.inspect_image(squashed_id))
+            step['size_saved'] = (
+                size - squashed_size
+                if size is not None and squashed_size is not None
+                else None
+            )
+        self.client.remove_image(image.id)
+        if step['size_saved'] is not None:
+            logger.info("Squashed image {image}, saving {size} bytes.".format(
+                image=squashed_id[:12],
+                size=step['size_saved']
+            ))
+        else:
+            logger.info("Squashed image {}.".format(squashed_id[:12]))
+        return Image(self.client, squashed_id, report=self.report)
+
+    def image_size(self, image, parent):
+        """
+        Returns the image's size and its growth over the parent image, if the
+        build is being reported.
+        """
+        if self.report is NULL_REPORT:
+            return {}
+        virtual_size = total_size(self.client.inspect_image(image))
+        parent_size = total_size(self.client.inspect_image(parent))
+        return {
+            'virtual_size': virtual_size,
+            'size_delta': (
+                virtual_size - parent_size
+                if virtual_size is not None and parent_size is not None
+                else None
+            ),
+        }
@@ -0,0 +1,291 @@
+import os
+import stat
+import time
+import logging
+import threading
+
+from docker_loader.archive import collect_files
+from docker_loader.utils import (
+    cache_directory,
+    digest,
+    file_digest,
+    read_json,
+    write_json,
+)
+
+
+logger = logging.getLogger(__name__)
+
+
+class BuildCache:
+    """
+    Index of intermediate images committed after each provisioner, keyed by
+    the parent image id, the provisioner's fingerprint and the context the
+    provisioner runs in.
+    """
+
+    INDEX_FILE = 'index.json'
+
+    def __init__(self, path=None, hash_cache=None):
+        self.path = path or cache_directory('layers')
+        self.hash_cache = hash_cache or FileHashCache()
+        self.lock = threading.RLock()
+        self.entries = self.load()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __iter__(self):
+        return iter(sorted(
+            self.entries.items(),
+            key=lambda item: item[1]['created']
+        ))
+
+    @property
+    def index_path(self):
+        return os.path.join(self.path, self.INDEX_FILE)
+
+    def load(self):
+        return read_json(self.index_path, {})
+
+    def save(self):
+        with self.lock:
+            write_json(self.index_path, self.entries)
+
+    def context(self, definition):
+        """
+        Digest of the definition's configuration of build containers, which
+        provisioners may depend on: environment, host name, entry point and
+        build volumes, including their contents.
+        """
+        return digest(
+            definition.environment,
+            definition.hostname,
+            definition.domainname,
+            definition.entry_point,
+            definition.build_volumes_from,
+            volumes_digest(definition.build_volumes, self.hash_cache)
+        )
+
+    def key(self, parent, provisioner, context=None):
+        return digest(parent, provisioner.fingerprint(), context)
+
+    def lookup(self, client, key):
+        from docker.errors import APIError
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            try:
+                client.inspect_image(entry['image'])
+            except APIError:
+                logger.info("Cached image {} no longer exists.".format(
+                    entry['image'][:12]
+                ))
+                del self.entries[key]
+                self.save()
+                return None
+            entry['used'] = time.time()
+            self.save()
+            return entry['image']
+
+    def store(self, key, parent, image, description):
+        with self.lock:
+            now = time.time()
+            self.entries[key] = {
+                'image': image,
+                'parent': parent,
+                'description': description,
+                'created': now,
+                'used': now,
+            }
+            self.save()
+
+    def prune(self, client, max_age=None, max_entries=None):
+        """
+        Removes cache entries, together with their images, which were not used
+        for more than ``max_age`` seconds or exceed ``max_entries`` most
+        recently used ones. Descendants of a removed entry are removed first.
+        Returns the list of removed keys.
+        """
+        with self.lock:
+            expired = set()
+            by_use = sorted(
+                self.entries,
+                key=lambda key: self.entries[key]['used'],
+                reverse=True
+            )
+            if max_age is not None:
+                threshold = time.time() - max_age
+                expired.update(
+                    key for key in by_use
+                    if self.entries[key]['used'] < threshold
+                )
+            if max_entries is not None:
+                expired.update(by_use[max_entries:])
+            removed = []
+            for key in expired:
+                self._remove(client, key, removed)
+            self.save()
+            return removed
+
+    def clear(self, client):
+        return self.prune(client, max_entries=0)
+
+    def _remove(self, client, key, removed):
+        from docker.errors import APIError
+        entry = self.entries.get(key)
+        if entry is None:
+            return
+        children = [
+            child_key for child_key, child in list(self.entries.items())
+            if child['parent'] == entry['image']
+        ]
+        for child_key in children:
+            self._remove(client, child_key, removed)
+        logger.info("Removing cached image {image}: {description}".format(
+            image=entry['image'][:12],
+            description=entry['description']
+        ))
+        try:
+            client.remove_image(entry['image'])
+        except APIError as error:
+            logger.warning(str(error))
+        del self.entries[key]
+        removed.append(key)
+
+
+class FileHashCache:
+    """
+    Persistent cache of file digests, keyed by path and invalidated when the
+    file's modification time or size changes.
+    """
+
+    def __init__(self, path=None):
+        self.path = path or cache_directory('hashes.json')
+        self.lock = threading.Lock()
+        self.entries = read_json(self.path, {})
+        self.modified = False
+
+    def digest(self, path, stat_result=None):
+        path = os.path.abspath(path)
+        if stat_result is None:
+            stat_result = os.stat(path)
+        signature = [stat_result.st_mtime, stat_result.st_size]
+        with self.lock:
+            entry = self.entries.get(path)
+        if entry is not None and entry[:2] == signature:
+            return entry[2]
+        result = file_digest(path)
+        with self.lock:
+            self.entries[path] = signature + [result]
+            self.modified = True
+        return result
+
+    def save(self):
+        with self.lock:
+            if self.modified:
+                write_json(self.path, self.entries)
+                self.modified = False
+
+
+def tree_digest(path, hash_cache):
+    """
+    Digest of a file or directory tree's names, modes and contents, using
+    the hash cache for file contents.
+    """
+    stat_result = os.lstat(path)
+    if not stat.S_ISDIR(stat_result.st_mode):
+        entries = [('', path, stat_result)]
+    else:
+        entries = collect_files(path)
+    contents = {}
+    for name, entry_path, entry_stat in entries:
+        if stat.S_ISREG(entry_stat.st_mode):
+            content = hash_cache.digest(entry_path, entry_stat)
+        elif stat.S_ISLNK(entry_stat.st_mode):
+            content = os.readlink(entry_path)
+        else:
+            content = None
+        contents[name] = [entry_stat.st_mode, content]
+    return digest(contents)
+
+
+def volumes_digest(build_volumes, hash_cache):
+    """Digest of build volume bindings and contents of their host paths."""
+    volumes = dict(
+        (path, [binding, tree_digest(path, hash_cache)])
+        for path, binding in build_volumes.items()
+    )
+    hash_cache.save()
+    return digest(volumes)
+
+
+class BuildIndex:
+    """
+    Index of built images keyed by a fingerprint of the whole build: the
+    definition's attributes, provisioner fingerprints, contents of build
+    volumes and the base image id. A build with an indexed fingerprint
+    whose image still exists can be skipped.
+    """
+
+    INDEX_FILE = 'index.json'
+
+    def __init__(self, path=None, hash_cache=None):
+        self.path = path or cache_directory('builds')
+        self.hash_cache = hash_cache or FileHashCache()
+        self.lock = threading.Lock()
+        self.entries = read_json(self.index_path, {})
+
+    def __len__(self):
+        return len(self.entries)
+
+    @property
+    def index_path(self):
+        return os.path.join(self.path, self.INDEX_FILE)
+
+    def fingerprint(self, definition, base_id, squash=False):
+        attributes = dict(
+            (name, getattr(definition, name))
+            for name in dir(definition)
+            if not name.startswith('_') and
+            name not in ('provisioners', 'build_volumes') and
+            not callable(getattr(definition, name))
+        )
+        return digest(
+            attributes,
+            [
+                provisioner.fingerprint()
+                for provisioner in definition.provisioners
+            ],
+            volumes_digest(definition.build_volumes, self.hash_cache),
+            base_id,
+            squash
+        )
+
+    def lookup(self, client, fingerprint):
+        """Returns the id of the indexed image, if it still exists."""
+        from docker.errors import APIError
+        with self.lock:
+            entry = self.entries.get(fingerprint)
+            if entry is None:
+                return None
+            try:
+                client.inspect_image(entry['image'])
+            except APIError:
+                logger.info("Indexed image {} no longer exists.".format(
+                    entry['image'][:12]
+                ))
+                del self.entries[fingerprint]
+                write_json(self.index_path, self.entries)
+                return None
+            return entry['image']
+
+    def store(self, fingerprint, image, description):
+        with self.lock:
+            self.entries[fingerprint] = {
+                'image': image,
+                'description': description,
+                'created': time.time(),
+            }
+            write_json(self.index_path, self.entries)
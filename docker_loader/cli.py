@@ -0,0 +1,156 @@
+from __future__ import print_function
+
+import os
+import sys
+import argparse
+import importlib
+
+from docker_loader.cache import BuildCache
+from docker_loader.shortcuts import build_all, default_client
+from docker_loader.validation import ValidationError, validate_all
+
+
+def load_definition(path):
+    module_name, separator, attribute = path.partition(':')
+    if not separator:
+        raise argparse.ArgumentTypeError(
+            "Definition must be given as module:attribute: {}".format(path)
+        )
+    # The console script, unlike python -m, does not put the working
+    # directory on the module search path.
+    if os.getcwd() not in sys.path:
+        sys.path.insert(0, os.getcwd())
+    module = importlib.import_module(module_name)
+    return getattr(module, attribute)
+
+
+def parse_target(value):
+    name, separator, path = value.partition('=')
+    if not separator:
+        raise argparse.ArgumentTypeError(
+            "Target must be given as name=module:attribute: {}".format(value)
+        )
+    return name, load_definition(path)
+
+
+def build_command(arguments):
+    results = build_all(
+        dict(arguments.targets),
+        verbose=not arguments.quiet,
+        cache=(True if arguments.cache else None),
+        index=(True if arguments.skip_unchanged else None),
+        exec_mode=arguments.exec_mode,
+        stream_output=arguments.stream_output,
+        concurrency=arguments.jobs,
+        pull_ttl=arguments.pull_ttl,
+        report=arguments.report
+    )
+    for name in sorted(results):
+        print(results[name])
+    return 0 if all(result.succeeded for result in results.values()) else 1
+
+
+def validate_command(arguments):
+    try:
+        validate_all(dict(arguments.targets))
+    except ValidationError as error:
+        print(error)
+        return 1
+    print("{} definitions are valid.".format(len(arguments.targets)))
+    return 0
+
+
+def cache_list_command(arguments):
+    for key, entry in BuildCache(arguments.cache_path):
+        print('{image} {key} {description}'.format(
+            image=entry['image'][:12],
+            key=key[:12],
+            description=entry['description']
+        ))
+    return 0
+
+
+def cache_prune_command(arguments):
+    cache = BuildCache(arguments.cache_path)
+    removed = cache.prune(
+        default_client(),
+        max_age=arguments.max_age,
+        max_entries=arguments.max_entries
+    )
+    print("Removed {} cache entries.".format(len(removed)))
+    return 0
+
+
+def parse_arguments(argv):
+    parser = argparse.ArgumentParser(prog='docker-loader')
+    commands = parser.add_subparsers(dest='command')
+    commands.required = True
+
+    build_parser = commands.add_parser(
+        'build',
+        help="Build images, running independent builds concurrently."
+    )
+    build_parser.add_argument(
+        'targets',
+        metavar='NAME=MODULE:DEFINITION',
+        nargs='+',
+        type=parse_target,
+        help="Image name to tag the result with and its definition."
+    )
+    build_parser.add_argument('-j', '--jobs', type=int, default=4)
+    build_parser.add_argument('-q', '--quiet', action='store_true')
+    build_parser.add_argument('--cache', action='store_true')
+    build_parser.add_argument(
+        '--skip-unchanged',
+        action='store_true',
+        help="Reuse images whose definition, files and base did not change."
+    )
+    build_parser.add_argument(
+        '--exec',
+        dest='exec_mode',
+        action='store_true'
+    )
+    build_parser.add_argument('--stream-output', action='store_true')
+    build_parser.add_argument(
+        '--pull-ttl',
+        type=float,
+        default=0,
+        help="Seconds for which a pulled base is considered up to date."
+    )
+    build_parser.add_argument(
+        '--report',
+        metavar='PATH',
+        default=None,
+        help="Write timings of all build steps to a JSON file."
+    )
+    build_parser.set_defaults(function=build_command)
+
+    validate_parser = commands.add_parser(
+        'validate',
+        help="Check image definitions, reporting all errors found."
+    )
+    validate_parser.add_argument(
+        'targets',
+        metavar='NAME=MODULE:DEFINITION',
+        nargs='+',
+        type=parse_target
+    )
+    validate_parser.set_defaults(function=validate_command)
+
+    cache_parser = commands.add_parser('cache', help="Manage build cache.")
+    cache_parser.add_argument('--cache-path', default=None)
+    cache_commands = cache_parser.add_subparsers(dest='cache_command')
+    cache_commands.required = True
+    cache_list_parser = cache_commands.add_parser('list')
+    cache_list_parser.set_defaults(function=cache_list_command)
+    cache_prune_parser = cache_commands.add_parser('prune')
+    cache_prune_parser.add_argument('--max-age', type=float, default=None)
+    cache_prune_parser.add_argument('--max-entries', type=int, default=None)
+    cache_prune_parser.set_defaults(function=cache_prune_command)
+
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    arguments = parse_arguments(sys.argv[1:] if argv is None else argv)
+    return arguments.function(arguments)
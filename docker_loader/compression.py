@@ -0,0 +1,101 @@
+import zlib
+import collections
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+def data_sink(output):
+    """Turns an object with a write method or a callable into a callable."""
+    if hasattr(output, 'write'):
+        return output.write
+    return output
+
+
+def compress_member(data, level):
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    return compressor.compress(data) + compressor.flush()
+
+
+class ParallelGzipWriter:
+    """
+    Compresses written data in chunks of ``chunk_size`` bytes on a pool of
+    threads, writing each chunk as a separate gzip member. Concatenated
+    members form a valid gzip stream.
+    """
+
+    def __init__(self, output, level=6, chunk_size=1024 * 1024, workers=None):
+        self.output = data_sink(output)
+        self.level = level
+        self.chunk_size = chunk_size
+        self.workers = workers or multiprocessing.cpu_count()
+        self.executor = ThreadPoolExecutor(max_workers=self.workers)
+        self.pending = collections.deque()
+        self.buffer = []
+        self.buffered = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args, **kwargs):
+        self.close()
+
+    def write(self, data):
+        self.buffer.append(data)
+        self.buffered += len(data)
+        if self.buffered >= self.chunk_size:
+            self.flush_buffer()
+            self.drain(2 * self.workers)
+
+    def flush_buffer(self):
+        if self.buffered:
+            self.pending.append(self.executor.submit(
+                compress_member,
+                b''.join(self.buffer),
+                self.level
+            ))
+            self.buffer = []
+            self.buffered = 0
+
+    def drain(self, limit):
+        while len(self.pending) > limit:
+            self.output(self.pending.popleft().result())
+
+    def close(self):
+        try:
+            self.flush_buffer()
+            self.drain(0)
+        finally:
+            self.executor.shutdown()
+
+
+class ZstdWriter:
+    """Compresses written data with zstd, using the given number of threads."""
+
+    def __init__(self, output, level=3, workers=None):
+        if zstandard is None:
+            raise RuntimeError("zstd compression requires zstandard package.")
+        self.output = data_sink(output)
+        compressor = zstandard.ZstdCompressor(
+            level=level,
+            threads=(workers or multiprocessing.cpu_count())
+        )
+        self.compressor = compressor.compressobj()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args, **kwargs):
+        self.close()
+
+    def write(self, data):
+        compressed = self.compressor.compress(data)
+        if compressed:
+            self.output(compressed)
+
+    def close(self):
+        self.output(self.compressor.flush())
@@ -1,6 +1,12 @@
 import sys
 import os
+import re
+import time
+import uuid
+import posixpath
+import codecs
 import logging
+import threading
 import tempfile
 import shutil
 
@@ -12,6 +18,19 @@ if six.PY3:
 else:
     from collections import Sequence
 
+from docker_loader.archive import extract_members
+from docker_loader.report import NULL_REPORT
+from docker_loader.spool import SpooledOutput
+from docker_loader.utils import (
+    STDOUT,
+    STDERR,
+    RingBuffer,
+    demultiplex,
+    raw_socket,
+    close_input,
+    send_input,
+)
+
 
 logger = logging.getLogger(__name__)
 
@@ -24,8 +43,23 @@ class ContainerCommandError(Exception):
         self.stdout = stdout
         self.stderr = stderr
 
+    def grep(self, pattern, flags=0):
+        """
+        Yields lines of stderr, then stdout, matching the regular
+        expression.
+        """
+        for output in (self.stderr, self.stdout):
+            if isinstance(output, SpooledOutput):
+                for line in output.grep(pattern, flags):
+                    yield line
+            else:
+                expression = re.compile(pattern, flags)
+                for line in output.splitlines():
+                    if expression.search(line):
+                        yield line
+
     def __str__(self):
-        if isinstance(self.command, file):
+        if hasattr(self.command, 'read'):
             return "Script exited with code {exit_code}: {script}".format(
                 exit_code=self.exit_code,
                 script=self.command.name
@@ -37,19 +71,133 @@ class ContainerCommandError(Exception):
             )
 
 
+def describe_command(command):
+    if isinstance(command, six.string_types):
+        return command
+    return ' '.join(command)
+
+
+def describe_script(script, limit=200):
+    if hasattr(script, 'read'):
+        description = getattr(script, 'name', '<script>')
+    elif isinstance(script, six.binary_type):
+        description = script.decode('utf-8', 'replace')
+    else:
+        description = describe_command(script)
+    return description[:limit]
+
+
+def console_output(stream, data):
+    output = sys.stderr if stream == 'stderr' else sys.stdout
+    output.write(data)
+    output.flush()
+
+
+def output_sink(output):
+    """
+    Turns True, a file-like object or a callable into a callable accepting
+    stream name and text.
+    """
+    if output is True:
+        return console_output
+    elif hasattr(output, 'write'):
+        return lambda stream, data: output.write(data)
+    else:
+        return output
+
+
+class OutputCapture:
+    """
+    Collects output of a command, optionally forwarding it incrementally to
+    a sink. With a buffer size given, only the last that many bytes of each
+    stream are kept. With a CommandSpool given, all output is written to its
+    files instead and returned as SpooledOutput views.
+    """
+
+    STREAM_NAMES = {
+        STDOUT: 'stdout',
+        STDERR: 'stderr',
+    }
+
+    def __init__(self, encoding, sink=None, buffer_size=None, spool=None):
+        self.encoding = encoding
+        self.sink = output_sink(sink)
+        self.spool = spool
+        self.buffers = {
+            stream: RingBuffer(buffer_size) for stream in self.STREAM_NAMES
+        }
+        self.decoders = {
+            stream: codecs.getincrementaldecoder(encoding)('replace')
+            for stream in self.STREAM_NAMES
+        }
+
+    def write(self, stream, data):
+        if self.spool is not None:
+            self.spool.write(stream, data)
+        else:
+            self.buffers[stream].write(data)
+        if self.sink is not None:
+            text = self.decoders[stream].decode(data)
+            if text:
+                self.sink(self.STREAM_NAMES[stream], text)
+
+    def adopt(self, stream, path):
+        """Takes a finished output file of the stream."""
+        if self.spool is not None:
+            self.spool.adopt(stream, path)
+        else:
+            with open(path, 'rb') as output_file:
+                self.write(stream, output_file.read())
+
+    def close(self):
+        if self.sink is not None:
+            for stream, decoder in self.decoders.items():
+                text = decoder.decode(b'', True)
+                if text:
+                    self.sink(self.STREAM_NAMES[stream], text)
+
+    @property
+    def size(self):
+        """Total number of bytes written, including dropped ones."""
+        if self.spool is not None:
+            return self.spool.size
+        return sum(
+            len(buffer) + buffer.dropped for buffer in self.buffers.values()
+        )
+
+    def getvalue(self, stream):
+        if self.spool is not None:
+            return self.spool.output(stream, self.encoding)
+        return self.buffers[stream].getvalue().decode(
+            self.encoding,
+            'replace'
+        )
+
+
 class Container:
 
     TEMP_VOLUME = '/provisioning'
     COMMAND_FILE = 'command.sh'
     STDOUT_FILE = 'stdout'
     STDERR_FILE = 'stderr'
+    FETCH_FILE = 'fetch.tar'
 
     SHELL = '/bin/sh'
+    KEEPALIVE_COMMAND = 'while :; do sleep 3600; done'
+    CHUNK_SIZE = 64 * 1024
+    POLL_INTERVAL = 0.1
 
     def __init__(self, client, image, encoding='utf-8', build_volumes=None,
-            build_volumes_from=None, **container_configuration):
+            build_volumes_from=None, exec_mode=False, output=None,
+            output_buffer_size=64 * 1024, report=None, spool=None,
+            **container_configuration):
         self.client = client
+        self.spool = spool
+        self.report = report or NULL_REPORT
         self.encoding = encoding
+        self.exec_mode = exec_mode
+        self.output = output
+        self.output_buffer_size = output_buffer_size
         self.container_configuration = container_configuration
         self.container_configuration['image'] = image
         self.container_configuration['user'] = 'root'
@@ -58,6 +206,7 @@ class Container:
         self.build_volumes_from = build_volumes_from or []
         self.id = None
         self.temp_dir = None
+        self.file_manifests = {}
 
     def __str__(self):
         if self.id is not None:
@@ -73,107 +222,162 @@ class Container:
         self.remove()
 
     def create(self):
+        if self.id is not None:
+            return
         if self.temp_dir is None:
             self.temp_dir = tempfile.mkdtemp()
-            os.chmod(self.temp_dir, 0777)
-        result = self.client.create_container(
-            command=[
-                self.SHELL,
-                '-c',
-                '{command_file} >{stdout_file} 2>{stderr_file}'.format(
-                    command_file='/'.join((
-                        self.TEMP_VOLUME,
-                        self.COMMAND_FILE
-                    )),
-                    stdout_file='/'.join((
-                        self.TEMP_VOLUME,
-                        self.STDOUT_FILE
-                    )),
-                    stderr_file='/'.join((
-                        self.TEMP_VOLUME,
-                        self.STDERR_FILE
-                    )),
-                ),
-            ],
-            **self.container_configuration
-        )
-        self.id = result['Id']
-        logger.info("Created container: {}".format(self))
+            os.chmod(self.temp_dir, 0o777)
+        if self.exec_mode:
+            command = self.KEEPALIVE_COMMAND
+        else:
+            command = '{command_file} >{stdout_file} 2>{stderr_file}'.format(
+                command_file='/'.join((
+                    self.TEMP_VOLUME,
+                    self.COMMAND_FILE
+                )),
+                stdout_file='/'.join((
+                    self.TEMP_VOLUME,
+                    self.STDOUT_FILE
+                )),
+                stderr_file='/'.join((
+                    self.TEMP_VOLUME,
+                    self.STDERR_FILE
+                )),
+            )
+        with self.report.measure('create'):
+            result = self.client.create_container(
+                command=[self.SHELL, '-c', command],
+                **self.container_configuration
+            )
+            self.id = result['Id']
+            logger.info("Created container: {}".format(self))
+            if self.exec_mode:
+                self.client.start(self.id, **self.start_configuration())
+                logger.info("Started container: {}".format(self))
 
     def remove(self):
         if self.id:
-            self.client.remove_container(
-                self.id,
-                v=True,
-                force=True
-            )
+            with self.report.measure('remove'):
+                self.client.remove_container(
+                    self.id,
+                    v=True,
+                    force=True
+                )
             logger.info("Removed container: {}".format(self))
             self.id = None
         if self.temp_dir is not None:
             shutil.rmtree(self.temp_dir, ignore_errors=True)
             self.temp_dir = None
 
-    def run(self, command, **additional_configuration):
+    def run(self, command, output=None, **additional_configuration):
+        if output is None:
+            output = self.output
         if hasattr(command, 'read'):
             logger.info("Running script.")
-            exit_code, stdout, stderr = self.execute(
-                command,
-                **additional_configuration
-            )
         else:
-            logger.info("Running: {}".format(
-                command
-                if isinstance(command, six.string_types)
-                else ' '.join(command)
-            ))
-            exit_code, stdout, stderr = self.execute(
-                command,
-                **additional_configuration
-            )
-        if stdout:
-            sys.stdout.write(stdout)
-        if stderr:
-            sys.stderr.write(stderr)
+            logger.info("Running: {}".format(describe_command(command)))
+        exit_code, stdout, stderr = self.execute(
+            command,
+            output=output,
+            **additional_configuration
+        )
+        if output is None:
+            for text, output_file in (
+                    (stdout, sys.stdout),
+                    (stderr, sys.stderr)):
+                if isinstance(text, SpooledOutput):
+                    text.write_to(output_file)
+                elif text:
+                    output_file.write(text)
         if exit_code != 0:
             raise ContainerCommandError(command, exit_code, stdout, stderr)
 
-    def execute(self, script, stdin=None, **additional_configuration):
+    def batch(self, **additional_configuration):
+        return CommandBatch(self, **additional_configuration)
+
+    def execute(self, script, stdin=None, output=None,
+            **additional_configuration):
+        """
+        Runs the script in the container, returning a tuple of exit code,
+        stdout and stderr. If output sink is given, either a callable
+        accepting stream name and text or a file-like object, output is
+        forwarded to it while the command runs and only its last
+        ``output_buffer_size`` bytes are returned. If the container has
+        a Spool, complete output is kept in it and returned as SpooledOutput
+        views instead of strings.
+        """
         assert self.id is not None
         assert self.temp_dir is not None
 
-        if isinstance(script, six.text_type):
-            script = script.strip().encode(self.encoding) + b'\n'
-        elif isinstance(script, six.binary_type):
-            script = script.strip() + b'\n'
-        elif isinstance(script, Sequence):
-            script = six.text_type(' ').join(
-                map(shlex_quote, map(six.text_type, script))
-            )
-            script = script.encode(self.encoding) + b'\n'
-        elif not hasattr(script, 'read'):
-            raise TypeError(
-                "Invalid script type: must be a string, a sequence of strings"
-                " or a file."
+        spool = None
+        if self.spool is not None:
+            spool = self.spool.command(describe_script(script))
+        if output is not None:
+            capture = OutputCapture(
+                self.encoding,
+                sink=output,
+                buffer_size=self.output_buffer_size,
+                spool=spool
             )
+        else:
+            capture = OutputCapture(self.encoding, spool=spool)
+        try:
+            with self.report.measure(
+                'execute',
+                command=describe_script(script)
+            ) as step:
+                self.write_command(script)
+                if self.exec_mode:
+                    if additional_configuration:
+                        raise TypeError(
+                            "Additional configuration is not supported in"
+                            " exec mode: {}".format(
+                                ', '.join(sorted(additional_configuration))
+                            )
+                        )
+                    exit_code = self.execute_exec(capture, stdin)
+                else:
+                    exit_code = self.execute_start(
+                        capture,
+                        stdin,
+                        additional_configuration
+                    )
+                step['exit_code'] = exit_code
+                step['output_bytes'] = capture.size
+        finally:
+            if spool is not None:
+                spool.close()
+        return exit_code, capture.getvalue(STDOUT), capture.getvalue(STDERR)
+
+    def write_command(self, script):
+        if not hasattr(script, 'read'):
+            script = self.encode_script(script)
         command_local_path = os.path.join(self.temp_dir, self.COMMAND_FILE)
-        with open(command_local_path, 'w') as command_file:
+        with open(command_local_path, 'wb') as command_file:
             if hasattr(script, 'read'):
-                shutil.copyfileobj(script, command_file)
+                while True:
+                    chunk = script.read(self.CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    if isinstance(chunk, six.text_type):
+                        chunk = chunk.encode(self.encoding)
+                    command_file.write(chunk)
             else:
                 command_file.write(script)
-        os.chmod(command_local_path, 0755)
+        os.chmod(command_local_path, 0o755)
 
-        additional_configuration.setdefault('binds', {})
-        additional_configuration['binds'].update(self.build_volumes)
-        additional_configuration['binds'][self.temp_dir] = {
-            'bind': self.TEMP_VOLUME,
-            'ro': False,
+    def execute_start(self, capture, stdin, additional_configuration):
+        paths = {
+            STDOUT: os.path.join(self.temp_dir, self.STDOUT_FILE),
+            STDERR: os.path.join(self.temp_dir, self.STDERR_FILE),
         }
-        if self.build_volumes_from:
-            additional_configuration['volumes_from'] = self.build_volumes_from
+        for path in paths.values():
+            if os.path.exists(path):
+                os.remove(path)
+
         self.client.start(
             self.id,
-            **additional_configuration
+            **self.start_configuration(additional_configuration)
         )
 
         if stdin is not None:
@@ -186,26 +390,392 @@ class Container:
                     'stream': 1,
                 }
             )
-            if hasattr(stdin, 'read'):
-                stdin = stdin.read()
-            if isinstance(stdin, six.text_type):
-                stdin = stdin.encode(self.encoding)
-            socket.sendall(stdin)
+            send_input(socket, stdin, self.encoding, self.CHUNK_SIZE)
             socket.close()
 
+        if capture.sink is not None:
+            return self.wait_streaming(capture, paths)
+
         exit_code = self.client.wait(self.id)
+        for stream, path in paths.items():
+            capture.adopt(stream, path)
+        return exit_code
+
+    def wait_streaming(self, capture, paths):
+        """
+        Waits for the container to stop, meanwhile following its output files
+        and forwarding new data to the capture.
+        """
+        result = {}
+
+        def wait():
+            try:
+                result['exit_code'] = self.client.wait(self.id)
+            except Exception as error:
+                result['error'] = error
+
+        waiter = threading.Thread(target=wait)
+        waiter.daemon = True
+        waiter.start()
+        files = {}
+        try:
+            while True:
+                finished = not waiter.is_alive()
+                for stream, path in paths.items():
+                    if stream not in files:
+                        try:
+                            files[stream] = open(path, 'rb')
+                        except (IOError, OSError):
+                            continue
+                    while True:
+                        chunk = files[stream].read(self.CHUNK_SIZE)
+                        if not chunk:
+                            break
+                        capture.write(stream, chunk)
+                if finished:
+                    break
+                waiter.join(self.POLL_INTERVAL)
+        finally:
+            for output_file in files.values():
+                output_file.close()
+            capture.close()
+        if 'error' in result:
+            raise result['error']
+        return result['exit_code']
 
-        stdout_local_path = os.path.join(self.temp_dir, self.STDOUT_FILE)
-        stderr_local_path = os.path.join(self.temp_dir, self.STDERR_FILE)
-        with open(stdout_local_path, 'r') as stdout_file:
-            stdout = stdout_file.read()
-        with open(stderr_local_path, 'r') as stderr_file:
-            stderr = stderr_file.read()
+    def execute_exec(self, capture, stdin=None):
+        exec_id = self.client.exec_create(
+            self.id,
+            [
+                self.SHELL,
+                '-c',
+                '/'.join((self.TEMP_VOLUME, self.COMMAND_FILE)),
+            ],
+            stdin=(stdin is not None),
+            user='root'
+        )['Id']
+        socket = self.client.exec_start(exec_id, socket=True)
+        # The socket keeps the client's timeout, which would interrupt
+        # commands printing nothing for that long.
+        raw_socket(socket).settimeout(None)
+        errors = []
 
-        return exit_code, stdout, stderr
+        def send():
+            try:
+                if stdin is not None:
+                    send_input(socket, stdin, self.encoding, self.CHUNK_SIZE)
+            except Exception as error:
+                errors.append(error)
+            finally:
+                close_input(socket)
+
+        sender = threading.Thread(target=send)
+        sender.daemon = True
+        sender.start()
+        try:
+            for stream, data in demultiplex(socket):
+                capture.write(stream, data)
+            sender.join()
+        finally:
+            socket.close()
+            capture.close()
+        if errors:
+            raise errors[0]
+        while True:
+            result = self.client.exec_inspect(exec_id)
+            if not result['Running']:
+                break
+            time.sleep(0.01)
+        return result['ExitCode']
+
+    def start_configuration(self, additional_configuration=None):
+        configuration = dict(additional_configuration or {})
+        configuration['binds'] = dict(configuration.get('binds', {}))
+        configuration['binds'].update(self.build_volumes)
+        configuration['binds'][self.temp_dir] = {
+            'bind': self.TEMP_VOLUME,
+            'ro': False,
+        }
+        if self.build_volumes_from:
+            configuration['volumes_from'] = self.build_volumes_from
+        return configuration
+
+    def encode_script(self, script):
+        if isinstance(script, six.text_type):
+            return script.strip().encode(self.encoding) + b'\n'
+        elif isinstance(script, six.binary_type):
+            return script.strip() + b'\n'
+        elif isinstance(script, Sequence):
+            script = six.text_type(' ').join(
+                map(shlex_quote, map(six.text_type, script))
+            )
+            return script.encode(self.encoding) + b'\n'
+        else:
+            raise TypeError(
+                "Invalid script type: must be a string, a sequence of strings"
+                " or a file."
+            )
+
+    def put_archive(self, path, data):
+        """
+        Extracts a tar archive into the existing directory at path. Data may
+        be bytes, a file or an iterable of chunks, which is streamed to the
+        daemon as it is consumed.
+        """
+        assert self.id is not None
+        with self.report.measure('put_archive', path=path):
+            self.client.put_archive(self.id, path, data)
+
+    def fetch_file(self, path, destination):
+        """
+        Copies a regular file from the container to a host path or file-like
+        object, extracting it from the archive as it is received.
+        """
+        assert self.id is not None
+        with self.report.measure('fetch', paths=[path]):
+            stream, stat = self.client.get_archive(self.id, path)
+            try:
+                extracted = extract_members(
+                    stream,
+                    {posixpath.basename(path.rstrip('/')): destination}
+                )
+            finally:
+                stream.close()
+        if not extracted:
+            raise IOError("Not a regular file in container: {}".format(path))
+
+    def fetch_files(self, files):
+        """
+        Copies regular files from the container, given as a mapping of
+        absolute container paths to host paths or file-like objects, in a
+        single archive created in the container.
+        """
+        assert self.id is not None
+        assert self.temp_dir is not None
+        if len(files) == 1:
+            path, destination = next(iter(files.items()))
+            return self.fetch_file(path, destination)
+        names = dict(
+            (posixpath.normpath(path).lstrip('/'), destination)
+            for path, destination in files.items()
+        )
+        local_path = os.path.join(self.temp_dir, self.FETCH_FILE)
+        with self.report.measure('fetch', paths=sorted(files)):
+            command = [
+                'tar',
+                '-cf',
+                '/'.join((self.TEMP_VOLUME, self.FETCH_FILE)),
+                '-C',
+                '/',
+            ] + sorted(names)
+            exit_code, stdout, stderr = self.execute(command)
+            if exit_code != 0:
+                raise ContainerCommandError(
+                    command,
+                    exit_code,
+                    stdout,
+                    stderr
+                )
+            try:
+                with open(local_path, 'rb') as archive_file:
+                    extracted = extract_members(archive_file, names)
+            finally:
+                os.remove(local_path)
+        missing = set(names) - extracted
+        if missing:
+            raise IOError("Not regular files in container: {}".format(
+                ', '.join('/' + name for name in sorted(missing))
+            ))
 
     def read_file(self, path):
         return self.client.copy(
             self.id,
             path
         )
+
+
+class CommandResult:
+
+    def __init__(self, command, exit_code, stdout, stderr):
+        self.command = command
+        self.exit_code = exit_code
+        self.stdout = stdout
+        self.stderr = stderr
+
+
+class BatchOutput:
+    """
+    Sink splitting output of a batch script into output of its commands at
+    the markers the script prints to both streams after each command,
+    forwarding the rest to another sink as it arrives. Only the last
+    ``buffer_size`` bytes of each command's streams are kept.
+    """
+
+    STREAMS = ('stdout', 'stderr')
+
+    def __init__(self, marker, encoding, sink=None, buffer_size=None):
+        self.marker = marker
+        self.encoding = encoding
+        self.sink = sink
+        self.buffer_size = buffer_size
+        self.pending = dict((stream, '') for stream in self.STREAMS)
+        self.buffers = dict(
+            (stream, [RingBuffer(buffer_size)]) for stream in self.STREAMS
+        )
+        self.exit_codes = []
+
+    def __call__(self, stream, text):
+        pending = self.pending[stream] + text
+        while True:
+            start = pending.find(self.marker)
+            if start == -1:
+                held = self.held_length(pending)
+                break
+            end = pending.find('\n', start)
+            if end == -1:
+                held = len(pending) - start
+                break
+            self.forward(stream, pending[:start])
+            if stream == 'stdout':
+                self.exit_codes.append(
+                    int(pending[start + len(self.marker):end])
+                )
+            self.buffers[stream].append(RingBuffer(self.buffer_size))
+            pending = pending[end + 1:]
+        self.forward(stream, pending[:len(pending) - held])
+        self.pending[stream] = pending[len(pending) - held:]
+
+    def held_length(self, text):
+        """Length of the text's end which may be the start of a marker."""
+        for length in range(min(len(text), len(self.marker) - 1), 0, -1):
+            if self.marker.startswith(text[-length:]):
+                return length
+        return 0
+
+    def forward(self, stream, text):
+        if not text:
+            return
+        self.buffers[stream][-1].write(text.encode(self.encoding))
+        if self.sink is not None:
+            self.sink(stream, text)
+
+    def close(self):
+        for stream in self.STREAMS:
+            self.forward(stream, self.pending[stream])
+            self.pending[stream] = ''
+
+    def output(self, stream, index):
+        buffers = self.buffers[stream]
+        if index >= len(buffers):
+            return ''
+        return buffers[index].getvalue().decode(self.encoding, 'replace')
+
+    def results(self, commands):
+        return [
+            CommandResult(
+                command,
+                exit_code,
+                self.output('stdout', index),
+                self.output('stderr', index)
+            )
+            for index, (command, exit_code) in enumerate(
+                zip(commands, self.exit_codes)
+            )
+        ]
+
+
+class CommandBatch:
+    """
+    Queues commands to be run in the container as a single script, stopping
+    at the first failing one. Each command's exit code and output are
+    captured separately, while the output is forwarded as the commands run.
+    Used as a context manager, runs the batch on exit.
+    """
+
+    def __init__(self, container, **additional_configuration):
+        self.container = container
+        self.additional_configuration = additional_configuration
+        self.commands = []
+        self.script_result = None
+        self.marker = '\x1ebatch-{}:'.format(uuid.uuid4().hex)
+
+    def __len__(self):
+        return len(self.commands)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, error_type, error, traceback):
+        if error_type is None:
+            self.run()
+
+    def add(self, command):
+        self.commands.append(command)
+        return self
+
+    def script(self):
+        mark = "printf '{}%d\\n' $status".format(
+            self.marker.replace('\x1e', '\\036')
+        ).encode('ascii')
+        lines = []
+        for command in self.commands:
+            lines.extend((
+                b'(',
+                self.container.encode_script(command).rstrip(b'\n'),
+                b')',
+                b'status=$?',
+                mark,
+                mark + b' >&2',
+                b'[ $status -eq 0 ] || exit $status',
+            ))
+        return b'\n'.join(lines) + b'\n'
+
+    def execute(self, output=None):
+        """
+        Runs queued commands, returning a list of CommandResult for every
+        command that was run. Output is forwarded to the sink while the
+        commands run. Exit code and output of the whole script are kept in
+        ``script_result``.
+        """
+        container = self.container
+        batch_output = BatchOutput(
+            self.marker,
+            container.encoding,
+            sink=(output_sink(output) if output is not None else None),
+            buffer_size=container.output_buffer_size
+        )
+        try:
+            self.script_result = container.execute(
+                self.script(),
+                output=batch_output,
+                **self.additional_configuration
+            )
+        finally:
+            batch_output.close()
+        return batch_output.results(self.commands)
+
+    def run(self, output=None):
+        if not self.commands:
+            return []
+        if output is None:
+            output = self.container.output
+        logger.info("Running batch: {}".format('; '.join(
+            describe_command(command) for command in self.commands
+        )))
+        results = self.execute(output=(output if output is not None else True))
+        for result in results:
+            if result.exit_code != 0:
+                raise ContainerCommandError(
+                    result.command,
+                    result.exit_code,
+                    result.stdout,
+                    result.stderr
+                )
+        if len(results) < len(self.commands):
+            # The script aborted before marking the command's end, for
+            # example on a syntax error, which only the script's output shows.
+            raise ContainerCommandError(
+                self.commands[len(results)],
+                *self.script_result
+            )
+        return results
@@ -0,0 +1,193 @@
+import logging
+import threading
+
+from docker_loader.builder import Builder
+from docker_loader.cache import BuildCache, BuildIndex
+from docker_loader.pull_manager import PullManager
+from docker_loader.scheduler import Scheduler
+from docker_loader.utils import (
+    cache_directory,
+    normalize_reference,
+    split_reference,
+)
+
+
+logger = logging.getLogger(__name__)
+
+
+class BuildHost:
+    """Docker daemon running up to ``capacity`` builds at once."""
+
+    def __init__(self, name, client, capacity=2, cache=None, index=None,
+            pull_ttl=0):
+        self.name = name
+        self.client = client
+        self.capacity = capacity
+        self.cache = cache
+        self.index = index
+        self.puller = PullManager(
+            client,
+            ttl=pull_ttl,
+            path=cache_directory('pulls', name),
+            concurrency=capacity
+        )
+        self.running = 0
+
+    def __str__(self):
+        return self.name
+
+    @property
+    def load(self):
+        return self.running / float(self.capacity)
+
+    def has_image(self, image):
+        from docker.errors import APIError
+        try:
+            return self.client.inspect_image(image)['Id']
+        except APIError:
+            return None
+
+    def affinity(self, definition):
+        """
+        Rates how much of the build the host can skip: whether it has the
+        base image and whether the first provisioner's result is cached.
+        """
+        base_id = self.has_image(definition.base)
+        if base_id is None:
+            return 0
+        if self.cache is not None and definition.provisioners:
+            key = self.cache.key(
+                base_id,
+                definition.provisioners[0],
+                self.cache.context(definition)
+            )
+            if key in self.cache.entries:
+                return 2
+        return 1
+
+
+class Dispatcher(Scheduler):
+    """
+    Builds a set of image definitions on several Docker hosts. Each build
+    runs on the least loaded host with free capacity, preferring hosts
+    which already have its base image or cached layers. Images based on
+    another definition are built on the host which built their base.
+
+    Clients are given as a mapping of host names to clients, or a sequence
+    of clients. Build cache and index, enabled with ``cache=True`` and
+    ``index=True``, are kept separately for every host.
+    """
+
+    def __init__(self, clients, definitions, capacity=2, cache=False,
+            index=False, pull_ttl=0, report=False,
+            **additional_configuration):
+        if not isinstance(clients, dict):
+            clients = dict(
+                ('host{}'.format(number), client)
+                for number, client in enumerate(clients)
+            )
+        self.hosts = [
+            BuildHost(
+                name,
+                client,
+                capacity=capacity,
+                cache=(
+                    BuildCache(cache_directory('layers', name))
+                    if cache else None
+                ),
+                index=(
+                    BuildIndex(cache_directory('builds', name))
+                    if index else None
+                ),
+                pull_ttl=pull_ttl
+            )
+            for name, client in sorted(clients.items())
+        ]
+        Scheduler.__init__(
+            self,
+            self.hosts[0].client,
+            definitions,
+            concurrency=sum(host.capacity for host in self.hosts),
+            puller=self.hosts[0].puller,
+            report=report,
+            **additional_configuration
+        )
+        self.condition = threading.Condition()
+        self.placements = {}
+
+    def close(self):
+        for host in self.hosts:
+            host.puller.close()
+
+    def prefetch(self):
+        # Bases are pulled by the host each build is dispatched to.
+        pass
+
+    def build_all(self):
+        results = Scheduler.build_all(self)
+        for name, result in results.items():
+            result.host = self.placements.get(name)
+        return results
+
+    def candidates(self, name):
+        base = normalize_reference(self.definitions[name].base)
+        if base in self.placements:
+            return [self.placements[base]]
+        return self.hosts
+
+    def acquire(self, name):
+        """Waits for a host with free capacity to build the image on."""
+        definition = self.definitions[name]
+        candidates = self.candidates(name)
+        affinity = dict(
+            (host, host.affinity(definition)) for host in candidates
+        )
+        with self.condition:
+            while True:
+                available = [
+                    host for host in candidates
+                    if host.running < host.capacity
+                ]
+                if available:
+                    break
+                self.condition.wait()
+            host = min(
+                available,
+                key=lambda host: (-affinity[host], host.load, host.name)
+            )
+            host.running += 1
+            self.placements[name] = host
+        logger.info("Building {name} on {host}.".format(
+            name=name,
+            host=host
+        ))
+        return host
+
+    def release(self, host):
+        with self.condition:
+            host.running -= 1
+            self.condition.notify_all()
+
+    def build(self, name):
+        definition = self.definitions[name]
+        base = normalize_reference(definition.base)
+        host = self.acquire(name)
+        try:
+            builder = Builder(
+                host.client,
+                definition,
+                cache=host.cache,
+                pull_base=(
+                    definition.pull_base and base not in self.definitions
+                ),
+                puller=host.puller,
+                report=self.reports.get(name),
+                index=host.index
+            )
+            repository, tag = split_reference(name)
+            return builder.run(**self.additional_configuration).tag(
+                repository,
+                tag
+            )
+        finally:
+            self.release(host)
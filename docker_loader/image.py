@@ -1,17 +1,27 @@
-import gzip
-import shutil
+import time
 import logging
 
+import six
+
+from docker_loader.compression import (
+    ParallelGzipWriter,
+    ZstdWriter,
+    data_sink,
+)
+from docker_loader.report import NULL_REPORT
+
 
 logger = logging.getLogger(__name__)
 
 
 class Image:
 
-    def __init__(self, client, id):
+    def __init__(self, client, id, report=None):
         self.client = client
         self.id = id
+        self.report = report or NULL_REPORT
         self.repository_tag = None
+        self.repository_tags = []
 
     def __str__(self):
         return self.repository_tag or self.id[:12]
@@ -26,35 +36,141 @@ class Image:
             repository=repository,
             tag=tag
         ))
-        self.client.tag(
-            self.id,
-            repository=repository,
-            tag=tag,
-            force=force,
-            **kwargs
-        )
+        with self.report.measure('tag', repository=repository, tag=tag):
+            self.client.tag(
+                self.id,
+                repository=repository,
+                tag=tag,
+                force=force,
+                **kwargs
+            )
         self.repository_tag = ':'.join((repository, tag))
+        if self.repository_tag not in self.repository_tags:
+            self.repository_tags.append(self.repository_tag)
         return self
 
     def remove(self, **kwargs):
         logger.info("Removing image: {}".format(self))
         self.client.remove_image(self.id, **kwargs)
 
+    @property
+    def names(self):
+        """Names under which the image is exported, all its tags or id."""
+        return list(self.repository_tags) or [self.id]
+
     def get(self):
-        if self.repository_tag:
-            return self.client.get_image(self.repository_tag)
-        else:
-            return self.client.get_image(self.id)
+        return get_images(self.client, self.names)
 
-    def save(self, path, compress=False):
+    def save(self, path, compress=False, chunk_size=1024 * 1024,
+            workers=None, level=None):
+        """
+        Saves the image with all its tags as a tarball. Path may also be
+        a file-like object or a callable accepting chunks of data. Compression
+        may be ``'gzip'`` (or True), compressed in parallel by ``workers``
+        threads, or ``'zstd'`` if zstandard package is available.
+        """
         logger.info("Saving image {image} to: {file}".format(
             image=self,
             file=path
         ))
-        if compress:
-            open_func = gzip.open
-        else:
-            open_func = open
-        with open_func(path, 'wb') as output:
-            shutil.copyfileobj(self.get(), output)
+        with self.report.measure('save', compress=compress) as step:
+            step['bytes'] = write_archive(
+                self.get(),
+                path,
+                compress=compress,
+                chunk_size=chunk_size,
+                workers=workers,
+                level=level
+            )
         return self
+
+
+def get_images(client, names):
+    """
+    Returns a stream of a single ``docker save`` archive containing all
+    given images, with each layer included once.
+    """
+    if len(names) == 1:
+        return client.get_image(names[0])
+    response = client._get(
+        client._url('/images/get'),
+        params={'names': names},
+        stream=True
+    )
+    client._raise_for_status(response)
+    return response.raw
+
+
+def save_images(images, path, **options):
+    """
+    Saves many images, with all their tags, to a single tarball, reading
+    layers they share from the daemon only once. Accepts the same options as
+    Image.save.
+    """
+    names = []
+    for image in images:
+        names.extend(name for name in image.names if name not in names)
+    logger.info("Saving images {images} to: {file}".format(
+        images=', '.join(map(str, images)),
+        file=path
+    ))
+    write_archive(get_images(images[0].client, names), path, **options)
+
+
+def write_archive(stream, path, compress=False, chunk_size=1024 * 1024,
+        workers=None, level=None):
+    """
+    Writes the stream to the path, file-like object or callable, optionally
+    compressed. Returns the number of uncompressed bytes written.
+    """
+    if isinstance(path, six.string_types):
+        with open(path, 'wb') as output:
+            return write_archive(
+                stream,
+                output,
+                compress,
+                chunk_size,
+                workers,
+                level
+            )
+    if compress is True:
+        compress = 'gzip'
+    if compress == 'gzip':
+        writer = ParallelGzipWriter(
+            path,
+            level=(6 if level is None else level),
+            chunk_size=chunk_size,
+            workers=workers
+        )
+    elif compress == 'zstd':
+        writer = ZstdWriter(
+            path,
+            level=(3 if level is None else level),
+            workers=workers
+        )
+    elif not compress:
+        writer = None
+    else:
+        raise ValueError("Unknown compression: {}".format(compress))
+    output = data_sink(writer or path)
+    started = time.time()
+    size = 0
+    try:
+        while True:
+            chunk = stream.read(chunk_size)
+            if not chunk:
+                break
+            size += len(chunk)
+            output(chunk)
+    finally:
+        if writer is not None:
+            writer.close()
+    elapsed = max(time.time() - started, 1e-6)
+    logger.info(
+        "Saved {size:.1f} MB in {elapsed:.1f}s ({rate:.1f} MB/s).".format(
+            size=size / 1048576.0,
+            elapsed=elapsed,
+            rate=size / 1048576.0 / elapsed
+        )
+    )
+    return size
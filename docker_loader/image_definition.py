@@ -1,9 +1,5 @@
-import six
-
-if six.PY3:
-    from collections.abc import Sequence, Mapping
-else:
-    from collections import Sequence, Mapping
+from docker_loader import validation
+from docker_loader.provisioner import Provisioner
 
 
 class ImageDefinition:
@@ -76,74 +72,59 @@ class ImageDefinition:
     build.
     """
 
+    squash = False
+    """
+    Whether to flatten the built image into a single layer, dropping files
+    of the base image which provisioners removed. Image history and author
+    are not preserved.
+    """
+
     provisioners = tuple()
     """
     Sequence of Provisioner instances, which will be run in the order provided.
     The cleanup methods will be run in reverse order.
     """
 
+    _schema = (
+        ('base', validation.string),
+        ('pull_base', validation.boolean),
+        ('squash', validation.boolean),
+        ('maintainer', validation.optional(validation.string)),
+        ('hostname', validation.optional(validation.string)),
+        ('domainname', validation.optional(validation.string)),
+        ('exposed_ports', validation.sequence_of(validation.port)),
+        ('volumes', validation.sequence_of(validation.string)),
+        ('environment', validation.mapping_of(
+            validation.string,
+            validation.text
+        )),
+        ('user', validation.optional(validation.string)),
+        ('working_directory', validation.optional(validation.string)),
+        ('entry_point', validation.optional(validation.command)),
+        ('command', validation.optional(validation.command)),
+        ('labels', validation.mapping_of(
+            validation.string,
+            validation.text
+        )),
+        ('build_volumes', validation.mapping_of(
+            validation.host_path,
+            validation.volume_binding
+        )),
+        ('build_volumes_from', validation.sequence_of(validation.string)),
+        ('provisioners', validation.sequence_of(
+            validation.instance_of(Provisioner)
+        )),
+    )
+    """
+    Sequence of attribute names and checks, compiled once per class by the
+    validation module. Subclasses list only the attributes they add or whose
+    checks they replace. Underscored, so that build index fingerprints, which
+    hash public attributes, leave it out.
+    """
+
     def validate(self):
-        def _validate_string(string):
-            assert isinstance(string, six.string_types)
-            assert string
-
-        def _validate_command(command):
-            assert isinstance(command, Sequence)
-            assert len(command) > 0
-            for element in command:
-                assert isinstance(element, six.string_types)
-
-        _validate_string(self.base)
-        assert isinstance(self.pull_base, bool)
-
-        if self.maintainer is not None:
-            _validate_string(self.maintainer)
-
-        if self.hostname is not None:
-            _validate_string(self.hostname)
-        if self.domainname is not None:
-            _validate_string(self.domainname)
-
-        assert isinstance(self.exposed_ports, Sequence)
-        for port in self.exposed_ports:
-            assert isinstance(port, Sequence)
-            assert len(port) == 2
-            assert isinstance(port[0], int)
-            assert port[0] > 0
-            assert port[0] < 2 ** 16
-            _validate_string(port[1])
-            assert port[1] in ('tcp', 'udp')
-
-        assert isinstance(self.volumes, Sequence)
-        for volume in self.volumes:
-            _validate_string(volume)
-
-        assert isinstance(self.environment, Mapping)
-        for name, value in self.environment.items():
-            _validate_string(name)
-            assert isinstance(value, six.string_types)
-
-        if self.user is not None:
-            _validate_string(self.user)
-
-        if self.working_directory is not None:
-            _validate_string(self.working_directory)
-
-        if self.entry_point is not None:
-            _validate_command(self.entry_point)
-        if self.command is not None:
-            _validate_command(self.command)
-
-        assert isinstance(self.build_volumes, Mapping)
-        for path, binding in self.build_volumes.items():
-            _validate_string(path)
-            assert set(binding.keys()).issubset({'bind', 'ro'})
-            _validate_string(binding['bind'])
-            if 'ro' in binding:
-                assert isinstance(binding['ro'], bool)
-
-        assert isinstance(self.build_volumes_from, Sequence)
-        for image_name in self.build_volumes_from:
-            _validate_string(image_name)
-
-        assert isinstance(self.provisioners, Sequence)
+        """
+        Raises ValidationError listing every invalid attribute of the
+        definition.
+        """
+        validation.validate(self)
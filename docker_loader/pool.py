@@ -0,0 +1,200 @@
+import time
+import logging
+import threading
+import collections
+from concurrent.futures import ThreadPoolExecutor
+
+from docker_loader.container import Container
+from docker_loader.utils import digest
+
+
+logger = logging.getLogger(__name__)
+
+
+class ContainerPool:
+    """
+    Keeps build containers created ahead of time, for every image and
+    configuration containers were requested with. Containers handed out by
+    ``acquire`` are never returned to the pool; it is refilled in the
+    background up to ``size`` containers per configuration and
+    ``max_containers`` in total. Containers idle for longer than
+    ``idle_timeout`` seconds are removed by a background thread, also once
+    builds stop requesting them.
+    """
+
+    # Container options which do not affect the created container.
+    BUILD_OPTIONS = (
+        'encoding',
+        'output',
+        'output_buffer_size',
+        'report',
+        'spool',
+    )
+
+    def __init__(self, client, size=1, max_containers=8, idle_timeout=300,
+            workers=2):
+        self.client = client
+        self.size = size
+        self.max_containers = max_containers
+        self.idle_timeout = idle_timeout
+        self.lock = threading.Lock()
+        self.idle = collections.defaultdict(collections.deque)
+        self.configurations = {}
+        self.pending = collections.defaultdict(int)
+        self.executor = ThreadPoolExecutor(max_workers=workers)
+        self.hits = 0
+        self.misses = 0
+        self.created = 0
+        self.evicted = 0
+        self.closed = False
+        self.stopped = threading.Event()
+        self.evictor = threading.Thread(target=self.evict_periodically)
+        self.evictor.daemon = True
+        self.evictor.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args, **kwargs):
+        self.close()
+
+    def __len__(self):
+        with self.lock:
+            return sum(len(entries) for entries in self.idle.values())
+
+    def key(self, image, configuration):
+        return digest(image, dict(
+            (name, value) for name, value in configuration.items()
+            if name not in self.BUILD_OPTIONS
+        ))
+
+    def acquire(self, image, **configuration):
+        """
+        Returns a container of the image, already created if the pool had
+        one. It is created on entering its context otherwise, like any other
+        container, and must be removed after use.
+        """
+        image = self.client.inspect_image(image)['Id']
+        key = self.key(image, configuration)
+        container = None
+        with self.lock:
+            self.configurations[key] = (image, configuration)
+            if self.idle[key]:
+                container = self.idle[key].popleft()[0]
+                self.hits += 1
+            else:
+                self.misses += 1
+        if container is not None:
+            logger.info("Using pooled container: {}".format(container))
+            for name in self.BUILD_OPTIONS:
+                if name in configuration:
+                    setattr(container, name, configuration[name])
+        else:
+            container = Container(self.client, image, **configuration)
+        self.evict_idle()
+        self.refill(key)
+        return container
+
+    def prepare(self, image, **configuration):
+        """Starts filling the pool for the image and configuration."""
+        image = self.client.inspect_image(image)['Id']
+        key = self.key(image, configuration)
+        with self.lock:
+            self.configurations[key] = (image, configuration)
+        self.refill(key)
+
+    def refill(self, key):
+        with self.lock:
+            if self.closed:
+                return
+            total = sum(len(entries) for entries in self.idle.values())
+            total += sum(self.pending.values())
+            missing = min(
+                self.size - len(self.idle[key]) - self.pending[key],
+                self.max_containers - total
+            )
+            if missing <= 0:
+                return
+            self.pending[key] += missing
+        for _ in range(missing):
+            self.executor.submit(self.create, key)
+
+    def create(self, key):
+        image, configuration = self.configurations[key]
+        container = Container(self.client, image, **dict(
+            (name, value) for name, value in configuration.items()
+            if name not in self.BUILD_OPTIONS
+        ))
+        try:
+            container.create()
+        except Exception as error:
+            logger.warning("Could not create pooled container: {}".format(
+                error
+            ))
+            container.remove()
+            with self.lock:
+                self.pending[key] -= 1
+            return
+        with self.lock:
+            self.pending[key] -= 1
+            if not self.closed:
+                self.idle[key].append((container, time.time()))
+                self.created += 1
+                container = None
+        if container is not None:
+            container.remove()
+
+    def evict_idle(self):
+        deadline = time.time() - self.idle_timeout
+        expired = []
+        with self.lock:
+            for entries in self.idle.values():
+                while entries and entries[0][1] < deadline:
+                    expired.append(entries.popleft()[0])
+            self.evicted += len(expired)
+        for container in expired:
+            logger.info("Removing idle pooled container: {}".format(
+                container
+            ))
+            container.remove()
+
+    def evict_periodically(self):
+        interval = self.idle_timeout / 4.0
+        while not self.stopped.wait(interval):
+            try:
+                self.evict_idle()
+            except Exception as error:
+                logger.warning("Could not evict idle containers: {}".format(
+                    error
+                ))
+
+    def stats(self):
+        with self.lock:
+            requests = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': (
+                    self.hits / float(requests) if requests else None
+                ),
+                'created': self.created,
+                'evicted': self.evicted,
+                'idle': sum(len(entries) for entries in self.idle.values()),
+            }
+
+    def close(self):
+        """Stops refilling the pool and removes all idle containers."""
+        with self.lock:
+            self.closed = True
+        self.stopped.set()
+        self.evictor.join()
+        self.executor.shutdown()
+        with self.lock:
+            containers = [
+                entry[0]
+                for entries in self.idle.values()
+                for entry in entries
+            ]
+            self.idle.clear()
+        for container in containers:
+            container.remove()
@@ -1,3 +1,6 @@
+from docker_loader.utils import digest
+
+
 class ProvisioningError(RuntimeError):
     pass
 
@@ -7,8 +10,35 @@ class Provisioner:
     def __str__(self):
         raise NotImplementedError()
 
+    def fingerprint(self):
+        """
+        Returns a string identifying the effect of this provisioner, used to
+        key the build cache. Subclasses reading external files must include
+        their contents. Subclasses with attributes which are not
+        JSON-serializable must override it, as digest refuses them.
+        """
+        return digest(
+            type(self).__module__,
+            type(self).__name__,
+            vars(self)
+        )
+
+    def build_volumes(self, image_definition):
+        """
+        Returns volumes to mount in the build container in addition to the
+        definition's ``build_volumes``, in the same format.
+        """
+        return {}
+
     def provision(self, container):
         raise NotImplementedError()
 
+    def skip(self):
+        """
+        Called instead of ``provision`` when the build will not run the
+        provisioner: its result is cached, or the build failed before it.
+        """
+        pass
+
     def cleanup(self, container):
         pass
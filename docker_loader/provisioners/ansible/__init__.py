@@ -1,52 +1,282 @@
 from __future__ import absolute_import
 
 import os
-
-from ansible.playbook import PlayBook
-from ansible.callbacks import (
-    PlaybookCallbacks,
-    PlaybookRunnerCallbacks,
-    AggregateStats,
-)
-from ansible.utils.plugins import connection_loader
-from ansible.inventory import Inventory
+import time
+import logging
+import threading
 
 from docker_loader.provisioner import Provisioner, ProvisioningError
 from docker_loader.provisioners.ansible import ansible_plugins
+from docker_loader.utils import digest, file_digest
+
+
+logger = logging.getLogger(__name__)
+
+
+plugins_lock = threading.Lock()
+plugins_registered = False
+
+
+def register_plugins():
+    """
+    Registers the docker connection plugin with Ansible. Ansible is imported
+    only once the first playbook runs, as loading it is slow.
+    """
+    global plugins_registered
+    with plugins_lock:
+        if plugins_registered:
+            return
+        from ansible.utils.plugins import connection_loader
+        connection_loader.add_directory(
+            os.path.dirname(ansible_plugins.__file__),
+            with_subdir=True
+        )
+        plugins_registered = True
+
+
+class PipeliningSwitch:
+    """
+    Enables Ansible pipelining while any playbook using it is running.
+    Ansible reads the setting from a global, which concurrent builds share.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.users = 0
+        self.previous = None
+
+    def __enter__(self):
+        from ansible import constants
+        with self.lock:
+            if not self.users:
+                self.previous = constants.ANSIBLE_SSH_PIPELINING
+                constants.ANSIBLE_SSH_PIPELINING = True
+            self.users += 1
+
+    def __exit__(self, *args, **kwargs):
+        from ansible import constants
+        with self.lock:
+            self.users -= 1
+            if not self.users:
+                constants.ANSIBLE_SSH_PIPELINING = self.previous
 
 
-connection_loader.add_directory(
-    os.path.dirname(ansible_plugins.__file__),
-    with_subdir=True
-)
+pipelining_switch = PipeliningSwitch()
+
+
+def run_playbook(playbook, hosts, pipelining=True, **additional_options):
+    """
+    Runs the playbook against build containers, given as a mapping of host
+    names to tuples of container and host variables. Returns Ansible's
+    summary of results per host.
+    """
+    from ansible.playbook import PlayBook
+    from ansible.callbacks import (
+        PlaybookCallbacks,
+        PlaybookRunnerCallbacks,
+        AggregateStats,
+    )
+    from ansible.inventory import Inventory
+    register_plugins()
+    stats = AggregateStats()
+    inventory = Inventory(host_list=sorted(hosts))
+    for host, (container, host_variables) in hosts.items():
+        ansible_host = inventory.get_host(host)
+        for name, value in host_variables.items():
+            ansible_host.set_variable(name, value)
+        ansible_host.set_variable('container', container)
+        ansible_host.set_variable('container_owner_pid', os.getpid())
+    playbook = PlayBook(
+        playbook=playbook,
+        host_list=sorted(hosts),
+        transport='docker',
+        inventory=inventory,
+        callbacks=PlaybookCallbacks(),
+        runner_callbacks=PlaybookRunnerCallbacks(stats=stats),
+        stats=stats,
+        **additional_options
+    )
+    if pipelining:
+        with pipelining_switch:
+            return playbook.run()
+    return playbook.run()
+
+
+def host_failed(result):
+    return bool(result['unreachable'] or result['failures'])
 
 
 class AnsiblePlayBook(Provisioner):
+    """
+    Runs an Ansible playbook against the build container. With pipelining,
+    each module is sent to the container in a single command instead of
+    being copied to a temporary file first.
+    """
 
-    def __init__(self, playbook, **additional_options):
+    def __init__(self, playbook, pipelining=True, **additional_options):
         self.playbook = playbook
+        self.pipelining = pipelining
         self.additional_options = additional_options
 
     def __str__(self):
         return "Run Ansible playbook: {}".format(self.playbook)
 
+    def fingerprint(self):
+        return digest(
+            Provisioner.fingerprint(self),
+            file_digest(self.playbook)
+        )
+
     def provision(self, container):
         host = container.id[:12]
-        stats = AggregateStats()
-        inventory = Inventory(host_list=[host])
-        inventory.get_host(host).set_variable('container', container)
-        playbook = PlayBook(
-            playbook=self.playbook,
-            host_list=[host],
-            transport='docker',
-            inventory=inventory,
-            callbacks=PlaybookCallbacks(),
-            runner_callbacks=PlaybookRunnerCallbacks(stats=stats),
-            stats=stats,
+        result = run_playbook(
+            self.playbook,
+            {host: (container, {})},
+            pipelining=self.pipelining,
             **self.additional_options
         )
-        result = playbook.run()
-        if result[host]['unreachable'] or result[host]['failures']:
+        if host_failed(result[host]):
             raise ProvisioningError(
                 "Errors occurred while running an Ansible playbook."
             )
+
+
+class PlaybookRound:
+
+    def __init__(self):
+        self.hosts = {}
+        self.started = False
+        self.finished = threading.Event()
+        self.results = None
+        self.error = None
+
+
+class AnsibleGroup:
+    """
+    Provisions the build containers of several images with a single run of
+    a playbook, using Ansible forks to run tasks on them in parallel. Each
+    image definition uses its own provisioner obtained from ``member``.
+
+    The playbook is started once every member's container is ready, or
+    ``window`` seconds after the first one is, so all members' builds must
+    be able to run concurrently. Members arriving later are provisioned in
+    another run. Builds which will not provision their member, because they
+    failed or their result was cached, withdraw it instead. Once every
+    member arrived or withdrew, the group waits for all of them again.
+    """
+
+    def __init__(self, playbook, forks=5, window=60, pipelining=True,
+            **additional_options):
+        self.playbook = playbook
+        self.forks = forks
+        self.window = window
+        self.pipelining = pipelining
+        self.additional_options = additional_options
+        self.members = []
+        self.pending = set()
+        self.condition = threading.Condition()
+        self.round = None
+
+    def member(self, **host_variables):
+        member = AnsibleGroupMember(self, host_variables)
+        self.members.append(member)
+        return member
+
+    def provision(self, member, container):
+        host = container.id[:12]
+        with self.condition:
+            if self.round is None or self.round.started:
+                self.round = PlaybookRound()
+            current = self.round
+            current.hosts[host] = (container, member.host_variables)
+            leader = len(current.hosts) == 1
+            self.account(member)
+        if leader:
+            self.lead(current)
+        else:
+            current.finished.wait()
+        if current.error is not None:
+            raise ProvisioningError(
+                "Ansible playbook failed: {}".format(current.error)
+            )
+        if host_failed(current.results[host]):
+            raise ProvisioningError(
+                "Errors occurred while running an Ansible playbook"
+                " on {}.".format(container)
+            )
+
+    def withdraw(self, member):
+        """Stops waiting for a member whose build will not provision it."""
+        with self.condition:
+            self.account(member)
+
+    def account(self, member):
+        # Called with the condition held, once the member arrived or withdrew.
+        if member not in self.pending:
+            # Every member was accounted for, or this one already was: the
+            # group is being used again.
+            self.pending = set(self.members)
+        self.pending.discard(member)
+        self.condition.notify_all()
+
+    def lead(self, current):
+        deadline = time.time() + self.window
+        with self.condition:
+            while self.pending:
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    logger.warning(
+                        "Running Ansible playbook {playbook} without {count}"
+                        " members not ready within {window} seconds.".format(
+                            playbook=self.playbook,
+                            count=len(self.pending),
+                            window=self.window
+                        )
+                    )
+                    break
+                self.condition.wait(remaining)
+            current.started = True
+        logger.info("Running Ansible playbook {} on {} containers.".format(
+            self.playbook,
+            len(current.hosts)
+        ))
+        try:
+            current.results = run_playbook(
+                self.playbook,
+                current.hosts,
+                pipelining=self.pipelining,
+                forks=self.forks,
+                **self.additional_options
+            )
+        except Exception as error:
+            current.error = error
+        finally:
+            current.finished.set()
+
+
+class AnsibleGroupMember(Provisioner):
+
+    def __init__(self, group, host_variables):
+        self.group = group
+        self.host_variables = host_variables
+
+    def __str__(self):
+        return "Run Ansible playbook with group: {}".format(
+            self.group.playbook
+        )
+
+    def fingerprint(self):
+        return digest(
+            type(self).__module__,
+            type(self).__name__,
+            self.group.playbook,
+            file_digest(self.group.playbook),
+            self.group.additional_options,
+            self.host_variables
+        )
+
+    def provision(self, container):
+        self.group.provision(self, container)
+
+    def skip(self):
+        self.group.withdraw(self)
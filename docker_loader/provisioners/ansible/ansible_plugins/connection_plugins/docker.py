@@ -1,14 +1,32 @@
+import os
+import posixpath
+
+import six
 from ansible.constants import BECOME_METHODS
 
+from docker_loader.archive import iter_tar
+
 
 class Connection(object):
+    """
+    Runs Ansible tasks in a build container. Modules are piped to the
+    interpreter's stdin when pipelining is enabled, and files are copied
+    through the daemon's archive endpoints. Combined with exec mode, every
+    task runs in the same long-lived container without restarting it.
+    """
 
     def __init__(self, runner, host, port, *args, **kwargs):
         self.runner = runner
         self.host = host
         self.port = port
-        self.has_pipelining = False
-        self.container = runner.inventory.get_host(host).vars['container']
+        self.has_pipelining = True
+        host_variables = runner.inventory.get_host(host).vars
+        self.container = host_variables['container']
+        owner_pid = host_variables.get('container_owner_pid')
+        if owner_pid is not None and owner_pid != os.getpid():
+            # Running in a forked Ansible worker, which must not share the
+            # Docker client's pooled connections with its parent.
+            self.container.client.close()
 
     def connect(self, port=None):
         return self
@@ -22,20 +40,22 @@ class Connection(object):
                 self.runner.become_method not in BECOME_METHODS):
             raise NotImplementedError()
         exit_code, stdout, stderr = self.container.execute(
-            [executable, '-c', cmd],
+            [executable or self.container.SHELL, '-c', cmd],
             stdin=in_data
         )
-        return exit_code, '', stdout, stderr
+        return (
+            exit_code,
+            '',
+            six.text_type(stdout),
+            six.text_type(stderr)
+        )
 
     def put_file(self, in_path, out_path):
-        with open(in_path, 'r') as input_file:
-            self.exec_command(
-                'cat > {}'.format(out_path),
-                '/tmp',
-                None,
-                in_data=input_file
-            )
+        directory, name = posixpath.split(out_path)
+        self.container.put_archive(
+            directory or '/',
+            iter_tar([(name, in_path, os.stat(in_path))])
+        )
 
     def fetch_file(self, in_path, out_path):
-        with open(out_path, 'w') as output:
-            output.write(self.container.read_file(in_path))
+        self.container.fetch_file(in_path, out_path)
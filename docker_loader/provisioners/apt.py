@@ -1,9 +1,194 @@
+import os
+import errno
+import fcntl
+import shutil
+import logging
+import threading
+import contextlib
+
+from docker_loader.container import Container
 from docker_loader.provisioner import Provisioner
+from docker_loader.utils import cache_directory, digest
+
+
+logger = logging.getLogger(__name__)
+
+
+class AptCache:
+    """
+    Host directory keeping downloaded packages and package lists across
+    builds. Packages are shared by all builds, lists are kept separately for
+    every base image. Once the cache grows over ``max_size`` bytes, least
+    recently used packages and lists are removed.
+
+    Lists are mounted over ``/var/lib/apt/lists`` and packages in the
+    provisioning volume, out of reach of the ``docker-clean`` hook of Debian
+    base images. Neither ends up in the built image.
+
+    apt refuses to run when another process holds the lock of its lists or
+    packages, so apt-get runs using the cache, and eviction, are serialized
+    with a lock file, also between builds in separate processes.
+    """
+
+    LISTS_PATH = '/var/lib/apt/lists'
+    ARCHIVES_PATH = '/'.join((Container.TEMP_VOLUME, 'apt-archives'))
+    USED_FILE = '.used'
+    LOCK_FILE = 'lock'
+
+    def __init__(self, path=None, max_size=2 * 1024 ** 3):
+        self.path = path or cache_directory('apt')
+        self.max_size = max_size
+        self.lock = threading.Lock()
+
+    def volumes(self, base):
+        archives = os.path.join(self.path, 'archives')
+        lists = os.path.join(self.path, 'lists', digest(base)[:16])
+        with self.lock:
+            for directory in (
+                    os.path.join(archives, 'partial'),
+                    os.path.join(lists, 'partial')):
+                if not os.path.isdir(directory):
+                    os.makedirs(directory)
+            with open(os.path.join(lists, self.USED_FILE), 'w'):
+                pass
+            with locked(self.path):
+                self.evict(keep=lists)
+        return {
+            archives: {'bind': self.ARCHIVES_PATH, 'ro': False},
+            lists: {'bind': self.LISTS_PATH, 'ro': False},
+        }
+
+    def entries(self):
+        """
+        Yields tuples of last use time, size and path of every package file
+        and list directory in the cache.
+        """
+        archives = os.path.join(self.path, 'archives')
+        for name in os.listdir(archives):
+            path = os.path.join(archives, name)
+            if os.path.isfile(path):
+                stat_result = os.stat(path)
+                yield (
+                    max(stat_result.st_atime, stat_result.st_mtime),
+                    stat_result.st_size,
+                    path
+                )
+        lists = os.path.join(self.path, 'lists')
+        for name in os.listdir(lists):
+            path = os.path.join(lists, name)
+            size = sum(
+                os.path.getsize(os.path.join(directory, file_name))
+                for directory, _, file_names in os.walk(path)
+                for file_name in file_names
+            )
+            try:
+                used = os.path.getmtime(os.path.join(path, self.USED_FILE))
+            except OSError:
+                used = 0
+            yield used, size, path
+
+    def evict(self, keep=None):
+        entries = sorted(self.entries())
+        size = sum(entry[1] for entry in entries)
+        for used, entry_size, path in entries:
+            if size <= self.max_size:
+                break
+            if path == keep:
+                continue
+            logger.info("Evicting from APT cache: {}".format(path))
+            if os.path.isdir(path):
+                shutil.rmtree(path, ignore_errors=True)
+            else:
+                try:
+                    os.remove(path)
+                except OSError as error:
+                    if error.errno != errno.ENOENT:
+                        raise
+            size -= entry_size
+
+    @classmethod
+    def has_lists(cls, path):
+        """Whether the lists directory holds any downloaded package lists."""
+        return any(
+            name not in ('partial', cls.LOCK_FILE, cls.USED_FILE)
+            for name in os.listdir(path)
+        )
+
+
+@contextlib.contextmanager
+def locked(path):
+    """Holds the lock of the APT cache at the path."""
+    with open(os.path.join(path, AptCache.LOCK_FILE), 'a') as lock_file:
+        fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+
+def mount_source(container, path):
+    """Returns the host directory mounted at the path, if any."""
+    for host_path, binding in container.build_volumes.items():
+        if binding['bind'] == path:
+            return host_path
+    return None
+
+
+def mounted(container, path):
+    return mount_source(container, path) is not None
+
+
+@contextlib.contextmanager
+def cache_locked(container):
+    """Holds the lock of the APT cache mounted in the container, if any."""
+    archives = mount_source(container, AptCache.ARCHIVES_PATH)
+    if archives is None:
+        yield
+        return
+    with locked(os.path.dirname(archives)):
+        yield
 
 
 class AptProvisioner(Provisioner):
     APT_GET = 'apt-get'
 
+    def __init__(self, cache=None):
+        self.cache = cache
+
+    def fingerprint(self):
+        return digest(
+            type(self).__module__,
+            type(self).__name__,
+            dict(
+                (name, value) for name, value in vars(self).items()
+                if name != 'cache'
+            )
+        )
+
+    def build_volumes(self, image_definition):
+        if self.cache is None:
+            return {}
+        return self.cache.volumes(image_definition.base)
+
+    def apt_get(self, container, *arguments):
+        """
+        Returns an apt-get command line, keeping downloaded packages in the
+        cache if the container has one mounted.
+        """
+        command = [self.APT_GET]
+        if mounted(container, AptCache.ARCHIVES_PATH):
+            command += [
+                '-o', 'Dir::Cache::Archives={}/'.format(
+                    AptCache.ARCHIVES_PATH
+                ),
+                '-o', 'APT::Keep-Downloaded-Packages=true',
+            ]
+        return command + list(arguments)
+
+    def run_apt_get(self, container, *arguments):
+        with cache_locked(container):
+            container.run(self.apt_get(container, *arguments))
+
 
 class AptUpdate(AptProvisioner):
 
@@ -11,7 +196,7 @@ class AptUpdate(AptProvisioner):
         return "Update APT cache."
 
     def provision(self, container):
-        container.run([self.APT_GET, 'update'])
+        self.run_apt_get(container, 'update')
 
 
 class AptClear(AptProvisioner):
@@ -20,15 +205,20 @@ class AptClear(AptProvisioner):
         return "Clear APT cache."
 
     def provision(self, container):
-        container.run([self.APT_GET, 'clean'])
-        container.run(['rm', '-rf', '/var/lib/apt/lists/*'])
+        with container.batch() as batch:
+            batch.add([self.APT_GET, 'clean'])
+            if not mounted(container, AptCache.LISTS_PATH):
+                batch.add('rm -rf /var/lib/apt/lists/*')
 
 
 class AptInstall(AptProvisioner):
 
-    def __init__(self, packages, build_only=False):
+    def __init__(self, packages, build_only=False, install_recommends=True,
+            cache=None):
+        AptProvisioner.__init__(self, cache=cache)
         self.packages = packages
         self.build_only = build_only
+        self.install_recommends = install_recommends
 
     def __str__(self):
         return "Install packages {detail}: {packages}".format(
@@ -37,12 +227,94 @@ class AptInstall(AptProvisioner):
         )
 
     def provision(self, container):
-        container.run([self.APT_GET, 'install', '-y'] + list(self.packages))
+        with cache_locked(container):
+            lists = mount_source(container, AptCache.LISTS_PATH)
+            if lists is not None and not AptCache.has_lists(lists):
+                # A cached AptUpdate layer does not include the lists, which
+                # may have been evicted from the cache since.
+                logger.info("No package lists in APT cache, updating.")
+                container.run(self.apt_get(container, 'update'))
+            container.run(self.install_command(container, self.packages))
 
     def cleanup(self, container):
         if self.build_only:
-            container.run([self.APT_GET, 'purge', '-y'] + list(self.packages))
-            container.run([self.APT_GET, 'autoremove', '-y'])
+            self.purge(container, self.packages)
+
+    def install_command(self, container, packages):
+        options = ['-y']
+        if not self.install_recommends:
+            options.append('--no-install-recommends')
+        return self.apt_get(container, 'install', *(options + list(packages)))
+
+    def purge(self, container, packages):
+        with container.batch() as batch:
+            batch.add([self.APT_GET, 'purge', '-y'] + list(packages))
+            batch.add([self.APT_GET, 'autoremove', '-y'])
+
+
+class AptTransaction(AptInstall):
+    """
+    Installs packages of several AptInstall provisioners with a single
+    apt-get run, purging all of their build-only packages at once.
+    """
+
+    def __init__(self, installs, install_recommends=True, cache=None):
+        self.installs = list(installs)
+        if cache is None:
+            cache = next(
+                (install.cache for install in self.installs
+                    if install.cache is not None),
+                None
+            )
+        AptInstall.__init__(
+            self,
+            unique(
+                package
+                for install in self.installs
+                for package in install.packages
+            ),
+            install_recommends=install_recommends,
+            cache=cache
+        )
+        permanent = set(
+            package
+            for install in self.installs if not install.build_only
+            for package in install.packages
+        )
+        self.build_only_packages = unique(
+            package
+            for install in self.installs if install.build_only
+            for package in install.packages
+            if package not in permanent
+        )
+
+    def __str__(self):
+        return "Install packages in a single transaction: {}".format(
+            ', '.join(self.packages)
+        )
+
+    def fingerprint(self):
+        return digest(
+            type(self).__module__,
+            type(self).__name__,
+            [install.fingerprint() for install in self.installs],
+            self.install_recommends
+        )
+
+    def provision(self, container):
+        for install in self.installs:
+            logger.info("Installing {packages} for: {install}".format(
+                packages=', '.join(install.packages),
+                install=install
+            ))
+        AptInstall.provision(self, container)
+
+    def cleanup(self, container):
+        if self.build_only_packages:
+            logger.info("Purging build-only packages: {}".format(
+                ', '.join(self.build_only_packages)
+            ))
+            self.purge(container, self.build_only_packages)
 
 
 class AptAutoremove(AptProvisioner):
@@ -52,3 +324,50 @@ class AptAutoremove(AptProvisioner):
 
     def provision(self, container):
         container.run([self.APT_GET, 'autoremove', '-y'])
+
+
+def unique(items):
+    result = []
+    seen = set()
+    for item in items:
+        if item not in seen:
+            seen.add(item)
+            result.append(item)
+    return result
+
+
+def coalesce(provisioners, install_recommends=None):
+    """
+    Returns the provisioners with every run of adjacent AptInstall
+    provisioners merged into a single AptTransaction. If install_recommends
+    is given, it applies to all installs. Otherwise only installs agreeing
+    on it are merged.
+    """
+    result = []
+    run = []
+
+    def flush():
+        if len(run) == 1 and install_recommends is None:
+            result.append(run[0])
+        elif run:
+            result.append(AptTransaction(
+                run,
+                install_recommends=(
+                    run[0].install_recommends
+                    if install_recommends is None
+                    else install_recommends
+                )
+            ))
+        del run[:]
+
+    for provisioner in provisioners:
+        if type(provisioner) is not AptInstall:
+            flush()
+            result.append(provisioner)
+            continue
+        if (run and install_recommends is None and
+                provisioner.install_recommends != run[0].install_recommends):
+            flush()
+        run.append(provisioner)
+    flush()
+    return result
@@ -0,0 +1,97 @@
+import os
+import stat
+import logging
+import posixpath
+
+from docker_loader.archive import collect_files, iter_tar
+from docker_loader.cache import FileHashCache
+from docker_loader.provisioner import Provisioner
+from docker_loader.utils import digest
+
+
+logger = logging.getLogger(__name__)
+
+
+class CopyFiles(Provisioner):
+    """
+    Copies the contents of a host directory into the container, streaming a
+    tar archive built from disk. Files already copied to the same
+    destination earlier in the build are skipped if unchanged.
+    """
+
+    def __init__(self, source, destination, include=None, exclude=None,
+            owner=(0, 0), hash_cache=None):
+        self.source = source
+        self.destination = destination
+        self.include = include
+        self.exclude = exclude
+        self.owner = tuple(owner)
+        self._hash_cache = hash_cache
+
+    def __str__(self):
+        return "Copy files: {} to {}".format(self.source, self.destination)
+
+    @property
+    def hash_cache(self):
+        if self._hash_cache is None:
+            self._hash_cache = FileHashCache()
+        return self._hash_cache
+
+    def fingerprint(self):
+        manifest, entries = self.manifest()
+        return digest(
+            type(self).__module__,
+            type(self).__name__,
+            self.destination,
+            self.owner,
+            dict(
+                (name, entry[2:])
+                for name, entry in manifest.items()
+            )
+        )
+
+    def manifest(self):
+        """
+        Returns a manifest of files to copy, mapping archive names to their
+        modification time, size, mode and content digest or link target,
+        and a list of archive entries.
+        """
+        prefix = self.destination.strip('/')
+        manifest = {}
+        entries = []
+        for relative_path, path, stat_result in collect_files(
+                self.source,
+                include=self.include,
+                exclude=self.exclude):
+            name = posixpath.join(prefix, relative_path)
+            if stat.S_ISREG(stat_result.st_mode):
+                content = self.hash_cache.digest(path, stat_result)
+            elif stat.S_ISLNK(stat_result.st_mode):
+                content = os.readlink(path)
+            else:
+                content = None
+            manifest[name] = [
+                stat_result.st_mtime,
+                stat_result.st_size,
+                stat_result.st_mode,
+                content,
+            ]
+            entries.append((name, path, stat_result))
+        self.hash_cache.save()
+        return manifest, entries
+
+    def provision(self, container):
+        manifest, entries = self.manifest()
+        previous = container.file_manifests.get(self.destination, {})
+        changed = [
+            entry for entry in entries
+            if previous.get(entry[0]) != manifest[entry[0]]
+        ]
+        logger.info("Copying {} of {} entries, {} unchanged.".format(
+            len(changed),
+            len(entries),
+            len(entries) - len(changed)
+        ))
+        if changed:
+            container.put_archive('/', iter_tar(changed, owner=self.owner))
+        container.file_manifests[self.destination] = manifest
@@ -1,4 +1,6 @@
+from docker_loader.container import describe_command
 from docker_loader.provisioner import Provisioner
+from docker_loader.utils import digest, file_digest
 
 
 class ShellCommand(Provisioner):
@@ -23,6 +25,35 @@ class ShellCommand(Provisioner):
             )
 
 
+class ShellCommands(Provisioner):
+    """
+    Runs a sequence of commands in a single container round-trip, stopping at
+    the first failing one.
+    """
+
+    def __init__(self, commands, cleanup_commands=(),
+            **additional_configuration):
+        self.commands = commands
+        self.cleanup_commands = cleanup_commands
+        self.additional_configuration = additional_configuration
+
+    def __str__(self):
+        return "Run shell commands: {}".format('; '.join(
+            map(describe_command, self.commands)
+        ))
+
+    def provision(self, container):
+        self.run_batch(container, self.commands)
+
+    def cleanup(self, container):
+        self.run_batch(container, self.cleanup_commands)
+
+    def run_batch(self, container, commands):
+        with container.batch(**self.additional_configuration) as batch:
+            for command in commands:
+                batch.add(command)
+
+
 class ShellScript(Provisioner):
 
     def __init__(self, script_path, cleanup_script_path=None,
@@ -34,6 +65,14 @@ class ShellScript(Provisioner):
     def __str__(self):
         return "Run shell script: {}".format(self.script_path)
 
+    def fingerprint(self):
+        return digest(
+            Provisioner.fingerprint(self),
+            file_digest(self.script_path),
+            (file_digest(self.cleanup_script_path)
+                if self.cleanup_script_path is not None else None)
+        )
+
     def provision(self, container):
         with open(self.script_path, 'r') as script_file:
             container.run(script_file, **self.additional_configuration)
@@ -41,7 +80,7 @@ class ShellScript(Provisioner):
     def cleanup(self, container):
         if self.cleanup_script_path is not None:
             with open(self.cleanup_script_path, 'r') as cleanup_script_file:
-                container.run_script(
+                container.run(
                     cleanup_script_file,
                     **self.additional_configuration
                 )
@@ -0,0 +1,97 @@
+import os
+import time
+import logging
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from docker_loader.utils import (
+    ProgressPrinter,
+    cache_directory,
+    normalize_reference,
+    pull_image,
+    read_json,
+    write_json,
+)
+
+
+logger = logging.getLogger(__name__)
+
+
+class PullManager:
+    """
+    Pulls images in parallel. All requests for the same image made during
+    the manager's lifetime are served by a single pull, and images whose
+    local id was checked within ``ttl`` seconds are not pulled at all.
+    """
+
+    STATE_FILE = 'pulls.json'
+
+    def __init__(self, client, ttl=0, path=None, concurrency=4):
+        self.client = client
+        self.ttl = ttl
+        self.path = path or cache_directory('pulls')
+        self.lock = threading.Lock()
+        self.pulls = {}
+        self.executor = ThreadPoolExecutor(max_workers=concurrency)
+        self.progress = ProgressPrinter()
+        self.state = read_json(self.state_path, {})
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args, **kwargs):
+        self.close()
+
+    @property
+    def state_path(self):
+        return os.path.join(self.path, self.STATE_FILE)
+
+    def close(self):
+        self.executor.shutdown()
+
+    def pull(self, image):
+        """Pulls the image if needed, returning its local id."""
+        return self.pull_async(image).result()
+
+    def pull_many(self, images):
+        futures = [self.pull_async(image) for image in images]
+        return [future.result() for future in futures]
+
+    def pull_async(self, image):
+        image = normalize_reference(image)
+        with self.lock:
+            if image in self.pulls:
+                return self.pulls[image]
+            image_id = self.fresh_id(image)
+            if image_id is not None:
+                logger.info("Image {} is up to date, not pulling.".format(
+                    image
+                ))
+                future = Future()
+                future.set_result(image_id)
+            else:
+                future = self.executor.submit(self._pull, image)
+            self.pulls[image] = future
+            return future
+
+    def fresh_id(self, image):
+        from docker.errors import APIError
+        entry = self.state.get(image)
+        if entry is None or time.time() - entry['checked'] > self.ttl:
+            return None
+        try:
+            image_id = self.client.inspect_image(image)['Id']
+        except APIError:
+            return None
+        return image_id if image_id == entry['id'] else None
+
+    def _pull(self, image):
+        pull_image(self.client, image, progress=self.progress)
+        image_id = self.client.inspect_image(image)['Id']
+        with self.lock:
+            self.state[image] = {
+                'id': image_id,
+                'checked': time.time(),
+            }
+            write_json(self.state_path, self.state)
+        return image_id
@@ -0,0 +1,68 @@
+import time
+import threading
+import contextlib
+
+from docker_loader.utils import write_json
+
+
+class BuildReport:
+    """
+    Records wall time and details of build steps. Hooks added with
+    ``add_hook`` are called with each step's dictionary as soon as the step
+    finishes.
+    """
+
+    def __init__(self, name=None):
+        self.name = name
+        self.steps = []
+        self.hooks = []
+        self.lock = threading.Lock()
+
+    def add_hook(self, hook):
+        self.hooks.append(hook)
+
+    @contextlib.contextmanager
+    def measure(self, kind, **details):
+        """
+        Measures the duration of the enclosed block. Yields the step
+        dictionary, to which the block may add its own details.
+        """
+        step = dict(details, kind=kind, started=time.time())
+        try:
+            yield step
+        except Exception as error:
+            step['error'] = str(error)
+            raise
+        finally:
+            step['duration'] = time.time() - step['started']
+            with self.lock:
+                self.steps.append(step)
+            for hook in self.hooks:
+                hook(step)
+
+    def totals(self):
+        totals = {}
+        for step in self.steps:
+            kind = step['kind']
+            totals[kind] = totals.get(kind, 0) + step['duration']
+        return totals
+
+    def to_dict(self):
+        return {
+            'name': self.name,
+            'steps': self.steps,
+            'totals': self.totals(),
+        }
+
+    def write(self, path):
+        write_json(path, self.to_dict())
+
+
+class NullReport:
+
+    @contextlib.contextmanager
+    def measure(self, kind, **details):
+        yield {}
+
+
+NULL_REPORT = NullReport()
@@ -0,0 +1,195 @@
+import inspect
+import logging
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+from docker_loader.builder import Builder
+from docker_loader.pull_manager import PullManager
+from docker_loader.report import BuildReport
+from docker_loader.utils import normalize_reference, split_reference
+
+
+logger = logging.getLogger(__name__)
+
+
+class BuildResult:
+
+    def __init__(self, name, image=None, error=None, skipped=False,
+            report=None, host=None):
+        self.name = name
+        self.host = host
+        self.image = image
+        self.error = error
+        self.skipped = skipped
+        self.report = report
+
+    def __str__(self):
+        if self.image is not None:
+            return "{name}: built {image}".format(
+                name=self.name,
+                image=self.image.id[:12]
+            )
+        elif self.skipped:
+            return "{name}: skipped, {error}".format(
+                name=self.name,
+                error=self.error
+            )
+        else:
+            return "{name}: failed, {error}".format(
+                name=self.name,
+                error=self.error
+            )
+
+    @property
+    def succeeded(self):
+        return self.image is not None
+
+
+def dependency_graph(definitions):
+    """
+    Maps every name in the given mapping of image names to definitions onto
+    the set of names its base depends on. Raises ValueError on cycles.
+    """
+    graph = {
+        name: set(
+            [normalize_reference(definition.base)]
+        ).intersection(definitions)
+        for name, definition in definitions.items()
+    }
+    visiting, visited = set(), set()
+
+    def visit(name):
+        if name in visited:
+            return
+        if name in visiting:
+            raise ValueError("Cyclic base dependency: {}".format(name))
+        visiting.add(name)
+        for dependency in graph[name]:
+            visit(dependency)
+        visiting.discard(name)
+        visited.add(name)
+
+    for name in graph:
+        visit(name)
+    return graph
+
+
+class Scheduler:
+    """
+    Builds a set of image definitions, each tagged with its name, running
+    independent builds concurrently. Definitions whose base is another
+    definition's name are built after it.
+    """
+
+    def __init__(self, client, definitions, concurrency=4, cache=None,
+            puller=None, report=False, index=None,
+            **additional_configuration):
+        self.client = client
+        self.definitions = {
+            normalize_reference(name): (
+                definition() if inspect.isclass(definition) else definition
+            )
+            for name, definition in definitions.items()
+        }
+        self.graph = dependency_graph(self.definitions)
+        self.concurrency = concurrency
+        self.cache = cache
+        self.index = index
+        self.reports = {}
+        if report:
+            self.reports = {
+                name: BuildReport(name) for name in self.definitions
+            }
+        self.additional_configuration = additional_configuration
+        self.puller = puller or PullManager(client, concurrency=concurrency)
+        self.owns_puller = puller is None
+
+    def run(self):
+        try:
+            return self.build_all()
+        finally:
+            self.close()
+
+    def close(self):
+        if self.owns_puller:
+            self.puller.close()
+
+    def prefetch(self):
+        """Starts pulling all external base images at once."""
+        for image in self.external_bases():
+            self.puller.pull_async(image)
+
+    def build_all(self):
+        self.prefetch()
+        results = {}
+        pending = set(self.definitions)
+        running = {}
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            while pending or running:
+                for name in sorted(pending):
+                    dependencies = self.graph[name]
+                    failed = [
+                        dependency for dependency in dependencies
+                        if dependency in results and
+                        not results[dependency].succeeded
+                    ]
+                    if failed:
+                        for provisioner in self.definitions[name].provisioners:
+                            provisioner.skip()
+                        results[name] = BuildResult(
+                            name,
+                            error="dependency {} failed".format(failed[0]),
+                            skipped=True
+                        )
+                        logger.error(str(results[name]))
+                        pending.discard(name)
+                    elif all(
+                        dependency in results for dependency in dependencies
+                    ):
+                        running[executor.submit(self.build, name)] = name
+                        pending.discard(name)
+                if not running:
+                    continue
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name = running.pop(future)
+                    error = future.exception()
+                    if error is None:
+                        results[name] = BuildResult(
+                            name,
+                            future.result(),
+                            report=self.reports.get(name)
+                        )
+                        logger.info(str(results[name]))
+                    else:
+                        results[name] = BuildResult(
+                            name,
+                            error=error,
+                            report=self.reports.get(name)
+                        )
+                        logger.error(str(results[name]))
+        return results
+
+    def external_bases(self):
+        return set(
+            normalize_reference(definition.base)
+            for definition in self.definitions.values()
+            if definition.pull_base
+        ).difference(self.definitions)
+
+    def build(self, name):
+        definition = self.definitions[name]
+        base = normalize_reference(definition.base)
+        builder = Builder(
+            self.client,
+            definition,
+            cache=self.cache,
+            pull_base=(definition.pull_base and base not in self.definitions),
+            puller=self.puller,
+            report=self.reports.get(name),
+            index=self.index
+        )
+        repository, tag = split_reference(name)
+        return builder.run(**self.additional_configuration).tag(
+            repository,
+            tag
+        )
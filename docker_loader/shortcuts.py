@@ -2,21 +2,110 @@ import sys
 import inspect
 import logging
 
-import docker
+import six
 
-from docker_loader.builder import Builder
+from docker_loader.builder import Builder, BuildError
+from docker_loader.cache import BuildCache, BuildIndex
+from docker_loader.pull_manager import PullManager
+from docker_loader.report import BuildReport
+from docker_loader.utils import write_json
+from docker_loader.scheduler import Scheduler
 
 
-def build(image_definition, client=None, verbose=True):
+def configure_logging(verbose):
     if verbose:
         logging.basicConfig(
             format='%(asctime)s %(levelname)s: %(message)s',
             level=logging.INFO,
             stream=sys.stdout,
         )
+
+
+def default_client():
+    # Imported here, as loading docker-py takes a noticeable part of
+    # docker-loader's import time.
+    import docker
+    return docker.Client()
+
+
+def build(image_definition, client=None, verbose=True, cache=None,
+        exec_mode=False, stream_output=False, pull_ttl=None, report=None,
+        index=None):
+    """
+    Builds the image definition. Report may be a BuildReport instance to
+    record the build's timings into, or a path to write them to as JSON.
+    With a BuildIndex, or True for the default one, an unchanged build
+    returns the previously built image.
+    """
+    configure_logging(verbose)
     if inspect.isclass(image_definition):
         image_definition = image_definition()
     if client is None:
-        client = docker.Client()
-    builder = Builder(client, image_definition)
-    return builder.run()
+        client = default_client()
+    if cache is True:
+        cache = BuildCache()
+    if index is True:
+        index = BuildIndex()
+    puller = None
+    if pull_ttl is not None:
+        puller = PullManager(client, ttl=pull_ttl)
+    report_path = None
+    if isinstance(report, six.string_types):
+        report_path, report = report, BuildReport()
+    builder = Builder(
+        client,
+        image_definition,
+        cache=cache,
+        puller=puller,
+        report=report,
+        index=index
+    )
+    try:
+        return builder.run(
+            exec_mode=exec_mode,
+            output=(True if stream_output else None)
+        )
+    except BuildError:
+        sys.exit(1)
+    finally:
+        if puller is not None:
+            puller.close()
+        if report_path is not None:
+            report.write(report_path)
+
+
+def build_all(image_definitions, client=None, verbose=True, cache=None,
+        exec_mode=False, stream_output=False, concurrency=4, pull_ttl=0,
+        report=None, index=None):
+    """
+    Builds a mapping of image names to definitions, tagging each image with
+    its name. Returns a mapping of names to BuildResult instances. If report
+    path is given, timings of all builds are written to it as JSON.
+    """
+    configure_logging(verbose)
+    if client is None:
+        client = default_client()
+    if cache is True:
+        cache = BuildCache()
+    if index is True:
+        index = BuildIndex()
+    with PullManager(client, ttl=pull_ttl, concurrency=concurrency) as puller:
+        scheduler = Scheduler(
+            client,
+            image_definitions,
+            concurrency=concurrency,
+            cache=cache,
+            puller=puller,
+            report=(report is not None),
+            index=index,
+            exec_mode=exec_mode,
+            output=(True if stream_output else None)
+        )
+        results = scheduler.run()
+    if report is not None:
+        write_json(report, {
+            name: result.report.to_dict()
+            for name, result in results.items()
+            if result.report is not None
+        })
+    return results
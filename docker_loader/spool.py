@@ -0,0 +1,275 @@
+import io
+import os
+import re
+import mmap
+import shutil
+import logging
+import tempfile
+import threading
+
+import six
+
+
+logger = logging.getLogger(__name__)
+
+
+class SpooledOutput:
+    """
+    Read-only view of command output kept in a spool file. The file is
+    memory-mapped on first use, so searching and slicing it does not read
+    the whole output into memory; text is decoded only for the part
+    requested.
+    """
+
+    def __init__(self, path, encoding='utf-8'):
+        self.path = path
+        self.encoding = encoding
+        self._data = None
+
+    def __len__(self):
+        return len(self.data)
+
+    def __bool__(self):
+        return len(self) > 0
+
+    __nonzero__ = __bool__
+
+    def __getitem__(self, index):
+        return self.data[index]
+
+    def __str__(self):
+        return self.text()
+
+    def __repr__(self):
+        return '<SpooledOutput {path}, {size} bytes>'.format(
+            path=self.path,
+            size=len(self)
+        )
+
+    def __eq__(self, other):
+        if isinstance(other, six.text_type):
+            return self.text() == other
+        if isinstance(other, SpooledOutput):
+            return self.data[:] == other.data[:]
+        return NotImplemented
+
+    def __ne__(self, other):
+        result = self.__eq__(other)
+        if result is NotImplemented:
+            return result
+        return not result
+
+    __hash__ = None
+
+    @property
+    def data(self):
+        """Contents as a memory map, or empty bytes for empty output."""
+        if self._data is None:
+            with open(self.path, 'rb') as spool_file:
+                if os.fstat(spool_file.fileno()).st_size:
+                    self._data = mmap.mmap(
+                        spool_file.fileno(),
+                        0,
+                        access=mmap.ACCESS_READ
+                    )
+                else:
+                    self._data = b''
+        return self._data
+
+    def close(self):
+        if isinstance(self._data, mmap.mmap):
+            self._data.close()
+        self._data = None
+
+    def encode(self, value):
+        if isinstance(value, six.text_type):
+            return value.encode(self.encoding)
+        return value
+
+    def find(self, value, start=0, end=None):
+        """Returns the byte offset of the string or bytes, or -1."""
+        if end is None:
+            end = len(self)
+        return self.data.find(self.encode(value), start, end)
+
+    def text(self, start=0, end=None):
+        return self.data[start:end].decode(self.encoding, 'replace')
+
+    def tail(self, size):
+        """Returns the text of the last ``size`` bytes."""
+        return self.text(max(len(self) - size, 0))
+
+    def lines(self):
+        start = 0
+        data = self.data
+        while start < len(data):
+            end = data.find(b'\n', start)
+            end = len(data) if end == -1 else end + 1
+            yield self.text(start, end)
+            start = end
+
+    def grep(self, pattern, flags=0):
+        """
+        Yields lines matching the regular expression, searching the
+        memory-mapped bytes and decoding only the matching lines.
+        """
+        expression = re.compile(self.encode(pattern), flags | re.MULTILINE)
+        data = self.data
+        position = 0
+        while position <= len(data):
+            match = expression.search(data, position)
+            if match is None:
+                break
+            start = data.rfind(b'\n', 0, match.start()) + 1
+            end = data.find(b'\n', match.end())
+            end = len(data) if end == -1 else end
+            yield self.text(start, end)
+            position = end + 1
+
+    def write_to(self, output, chunk_size=64 * 1024):
+        """Writes the decoded text to a file-like object in chunks."""
+        data = self.data
+        for start in range(0, len(data), chunk_size):
+            output.write(self.text(start, start + chunk_size))
+
+
+class CommandSpool:
+    """Output files of a single command in the spool."""
+
+    STREAM_FILES = {
+        1: 'stdout',
+        2: 'stderr',
+    }
+
+    def __init__(self, spool, path):
+        self.spool = spool
+        self.path = path
+        self.files = {}
+        self.sizes = dict((stream, 0) for stream in self.STREAM_FILES)
+        self.closed = False
+
+    def stream_path(self, stream):
+        return os.path.join(self.path, self.STREAM_FILES[stream])
+
+    def write(self, stream, data):
+        if stream not in self.files:
+            self.files[stream] = open(self.stream_path(stream), 'ab')
+        self.files[stream].write(data)
+        self.sizes[stream] += len(data)
+
+    def adopt(self, stream, path):
+        """Moves a finished output file of the stream into the spool."""
+        self.close_stream(stream)
+        shutil.move(path, self.stream_path(stream))
+        self.sizes[stream] = os.path.getsize(self.stream_path(stream))
+
+    def close_stream(self, stream):
+        output_file = self.files.pop(stream, None)
+        if output_file is not None:
+            output_file.close()
+
+    def close(self):
+        for stream in list(self.files):
+            self.close_stream(stream)
+        for stream in self.STREAM_FILES:
+            open(self.stream_path(stream), 'ab').close()
+        self.closed = True
+        self.spool.enforce_budget(keep=self)
+
+    @property
+    def size(self):
+        return sum(self.sizes.values())
+
+    def output(self, stream, encoding='utf-8'):
+        return SpooledOutput(self.stream_path(stream), encoding)
+
+
+class Spool:
+    """
+    Directory keeping output of every command in files, for inspection after
+    the build. Output of the oldest commands is removed once the spool takes
+    more than ``budget`` bytes. Output of commands still running and of the
+    last finished one is always kept. Output kept in the directory by earlier
+    runs is counted in the budget, and new commands are numbered after it.
+    """
+
+    DESCRIPTION_FILE = 'command'
+
+    def __init__(self, path=None, budget=256 * 1024 * 1024):
+        if path is None:
+            path = tempfile.mkdtemp(prefix='docker-loader-spool-')
+        elif not os.path.isdir(path):
+            os.makedirs(path)
+        self.path = path
+        self.budget = budget
+        self.lock = threading.Lock()
+        self.counter = 0
+        self.commands = []
+        self.load()
+
+    def __len__(self):
+        return len(self.commands)
+
+    def load(self):
+        """Adopts output of commands found in the directory."""
+        names = sorted(
+            (
+                name for name in os.listdir(self.path)
+                if name.isdigit() and
+                os.path.isdir(os.path.join(self.path, name))
+            ),
+            key=int
+        )
+        for name in names:
+            command = CommandSpool(self, os.path.join(self.path, name))
+            for stream in command.STREAM_FILES:
+                try:
+                    command.sizes[stream] = os.path.getsize(
+                        command.stream_path(stream)
+                    )
+                except OSError:
+                    pass
+            command.closed = True
+            self.commands.append(command)
+        if names:
+            self.counter = int(names[-1])
+
+    def command(self, description=None):
+        """
+        Returns a CommandSpool for output of a new command, recording its
+        description alongside.
+        """
+        with self.lock:
+            self.counter += 1
+            path = os.path.join(self.path, '{:06d}'.format(self.counter))
+            os.mkdir(path)
+            command = CommandSpool(self, path)
+            self.commands.append(command)
+        if description is not None:
+            with io.open(
+                    os.path.join(path, self.DESCRIPTION_FILE),
+                    'w',
+                    encoding='utf-8') as description_file:
+                description_file.write(six.text_type(description))
+        return command
+
+    def enforce_budget(self, keep=None):
+        with self.lock:
+            total = sum(command.size for command in self.commands)
+            for command in list(self.commands):
+                if total <= self.budget:
+                    break
+                if command is keep or not command.closed:
+                    continue
+                self.commands.remove(command)
+                total -= command.size
+                logger.debug("Removing spooled output: {}".format(
+                    command.path
+                ))
+                shutil.rmtree(command.path, ignore_errors=True)
+
+    def clear(self):
+        with self.lock:
+            for command in self.commands:
+                shutil.rmtree(command.path, ignore_errors=True)
+            del self.commands[:]
@@ -1,21 +1,232 @@
 from __future__ import print_function
 
+import os
+import io
 import sys
 import json
+import stat
+import collections
+import struct
+import hashlib
 import logging
+import socket
+import tempfile
+import threading
+
+import six
 
 
 logger = logging.getLogger(__name__)
 
 
+STDOUT = 1
+STDERR = 2
+
+
 class DockerError(Exception):
     pass
 
 
-def pull_image(client, image):
-    parts = image.split(':', 1)
-    repository = parts[0]
-    tag = (parts[1] if len(parts) > 1 else 'latest')
+class RingBuffer:
+    """
+    Byte buffer keeping only the last ``size`` bytes written to it, or
+    everything if size is None.
+    """
+
+    def __init__(self, size=None):
+        self.size = size
+        self.chunks = collections.deque()
+        self.length = 0
+        self.dropped = 0
+
+    def __len__(self):
+        return self.length
+
+    def write(self, data):
+        if not data:
+            return
+        self.chunks.append(data)
+        self.length += len(data)
+        if self.size is None:
+            return
+        while self.length > self.size:
+            excess = self.length - self.size
+            head = self.chunks[0]
+            if len(head) <= excess:
+                self.chunks.popleft()
+                removed = len(head)
+            else:
+                self.chunks[0] = head[excess:]
+                removed = excess
+            self.length -= removed
+            self.dropped += removed
+
+    def getvalue(self):
+        return b''.join(self.chunks)
+
+
+def read_json(path, default=None):
+    try:
+        with open(path, 'r') as input_file:
+            return json.load(input_file)
+    except (IOError, OSError, ValueError):
+        return default
+
+
+def write_json(path, data):
+    """Atomically replaces the file at path with data serialized to JSON."""
+    directory = os.path.dirname(path) or os.curdir
+    if not os.path.isdir(directory):
+        os.makedirs(directory)
+    descriptor, temp_path = tempfile.mkstemp(dir=directory)
+    with os.fdopen(descriptor, 'w') as output_file:
+        json.dump(data, output_file, indent=2, sort_keys=True)
+    os.rename(temp_path, path)
+
+
+def cache_directory(*parts):
+    root = os.environ.get('XDG_CACHE_HOME') or os.path.join(
+        os.path.expanduser('~'),
+        '.cache'
+    )
+    return os.path.join(root, 'docker-loader', *parts)
+
+
+def unserializable(value):
+    raise TypeError(
+        "Cannot digest {}: only JSON-serializable values have a"
+        " representation stable across runs.".format(type(value).__name__)
+    )
+
+
+def digest(*parts):
+    """
+    Returns a hex digest of strings, bytes and JSON-serializable values.
+    Raises TypeError for other values.
+    """
+    result = hashlib.sha256()
+    for part in parts:
+        if isinstance(part, six.text_type):
+            part = part.encode('utf-8')
+        elif not isinstance(part, six.binary_type):
+            part = json.dumps(
+                part,
+                sort_keys=True,
+                default=unserializable
+            ).encode('utf-8')
+        result.update(hashlib.sha256(part).digest())
+    return result.hexdigest()
+
+
+def file_digest(path, chunk_size=1024 * 1024):
+    result = hashlib.sha256()
+    with open(path, 'rb') as input_file:
+        for chunk in iter(lambda: input_file.read(chunk_size), b''):
+            result.update(chunk)
+    return result.hexdigest()
+
+
+def raw_socket(sock):
+    """
+    Returns the underlying socket of a docker-py attach or exec socket, which
+    on Python 3 is wrapped in a SocketIO object.
+    """
+    return getattr(sock, '_sock', sock)
+
+
+def receive_exactly(sock, size):
+    data = b''
+    while len(data) < size:
+        chunk = sock.recv(size - len(data))
+        if not chunk:
+            break
+        data += chunk
+    return data
+
+
+def demultiplex(sock, chunk_size=64 * 1024):
+    """
+    Reads a multiplexed non-TTY attach or exec stream, yielding (stream, data)
+    pairs as they arrive. Stream is either STDOUT or STDERR.
+    """
+    sock = raw_socket(sock)
+    while True:
+        header = receive_exactly(sock, 8)
+        if len(header) < 8:
+            return
+        stream, length = struct.unpack('>BxxxL', header)
+        while length > 0:
+            data = sock.recv(min(length, chunk_size))
+            if not data:
+                return
+            length -= len(data)
+            yield stream, data
+
+
+def regular_file_descriptor(source):
+    try:
+        descriptor = source.fileno()
+    except (AttributeError, IOError, OSError, ValueError):
+        return None
+    if not stat.S_ISREG(os.fstat(descriptor).st_mode):
+        return None
+    return descriptor
+
+
+def send_input(sock, source, encoding='utf-8', chunk_size=64 * 1024):
+    """
+    Sends the source to the socket without loading it into memory as
+    a whole. Source may be a string, a bytes-like object, a file or an
+    iterable of chunks. Regular files are sent with sendfile where
+    available.
+    """
+    sock = raw_socket(sock)
+    if isinstance(source, six.text_type):
+        source = source.encode(encoding)
+    if isinstance(source, (six.binary_type, bytearray, memoryview)):
+        view = memoryview(source)
+        for offset in range(0, len(view), chunk_size):
+            sock.sendall(view[offset:offset + chunk_size])
+        return
+    descriptor = regular_file_descriptor(source)
+    if descriptor is not None and hasattr(sock, 'sendfile'):
+        with io.open(descriptor, 'rb', closefd=False) as raw_file:
+            sock.sendfile(raw_file)
+        return
+    if hasattr(source, 'read'):
+        chunks = iter(lambda: source.read(chunk_size), source.read(0))
+    else:
+        chunks = iter(source)
+    for chunk in chunks:
+        if isinstance(chunk, six.text_type):
+            chunk = chunk.encode(encoding)
+        sock.sendall(chunk)
+
+
+def close_input(sock):
+    try:
+        raw_socket(sock).shutdown(socket.SHUT_WR)
+    except (OSError, socket.error):
+        pass
+
+
+def split_reference(image):
+    """
+    Splits an image reference into repository and tag, taking registry ports
+    into account.
+    """
+    repository, separator, tag = image.rpartition(':')
+    if not separator or '/' in tag:
+        return image, 'latest'
+    return repository, tag
+
+
+def normalize_reference(image):
+    return ':'.join(split_reference(image))
+
+
+def pull_image(client, image, progress=None):
+    repository, tag = split_reference(image)
     logger.info("Pulling image: {repository}:{tag}".format(
         repository=repository,
         tag=tag
@@ -25,30 +236,73 @@ def pull_image(client, image):
         tag=tag,
         stream=True
     )
-    print_progress(log_stream)
+    if progress is None:
+        print_progress(log_stream)
+    else:
+        progress.consume(log_stream, prefix=image)
 
 
 def print_progress(stream):
-    allow_progress = sys.stdout.isatty()
-    showing_progress = False
-    for line in stream:
-        line = json.loads(line)
-        if 'progress' in line:
-            if allow_progress:
-                sys.stdout.write('\r{}: {}'.format(
-                    line['id'],
-                    line['progress']
-                ))
-                showing_progress = True
-        else:
-            if showing_progress:
-                sys.stdout.write('\n')
-                showing_progress = False
+    ProgressPrinter().consume(stream)
+
+
+class ProgressPrinter:
+    """
+    Prints progress of possibly many concurrent pulls. On a terminal,
+    progress of all layers being transferred is shown on a single status
+    line, other messages are printed above it.
+    """
+
+    STATUS_WIDTH = 79
+
+    def __init__(self, output=None):
+        self.output = output or sys.stdout
+        self.allow_progress = self.output.isatty()
+        self.lock = threading.Lock()
+        self.active = collections.OrderedDict()
+        self.status_length = 0
+
+    def consume(self, stream, prefix=None):
+        for line in stream:
+            self.handle(json.loads(line), prefix)
+
+    def handle(self, line, prefix=None):
+        with self.lock:
+            layer = (prefix, line.get('id'))
+            if 'progress' in line:
+                if self.allow_progress:
+                    self.active[layer] = line['progress']
+                    self.render()
+                return
+            self.active.pop(layer, None)
+            self.clear()
             if 'id' in line:
-                print('{}: {}'.format(line['id'], line['status']))
+                message = '{}: {}'.format(line['id'], line['status'])
             elif 'error' in line:
+                self.render()
                 raise DockerError(line['error'])
             elif 'status' in line:
-                print(line['status'])
+                message = line['status']
             else:
-                print(line)
+                message = str(line)
+            if prefix is not None:
+                message = '{}: {}'.format(prefix, message)
+            self.output.write(message + '\n')
+            self.render()
+
+    def render(self):
+        if not self.active:
+            return
+        status = ' | '.join(
+            '{}: {}'.format(layer_id, progress)
+            for (prefix, layer_id), progress in self.active.items()
+        )[:self.STATUS_WIDTH]
+        padding = ' ' * max(self.status_length - len(status), 0)
+        self.output.write('\r' + status + padding)
+        self.output.flush()
+        self.status_length = len(status)
+
+    def clear(self):
+        if self.status_length:
+            self.output.write('\r' + ' ' * self.status_length + '\r')
+            self.status_length = 0
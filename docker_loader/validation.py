@@ -0,0 +1,233 @@
+"""
+Validation of image definitions. Every definition class declares a
+``_schema``: a sequence of attribute names and checks, extended by
+subclasses. Schemas are merged once per class and cached, and validation
+reports every invalid attribute with its path instead of stopping at the
+first one.
+"""
+
+import os
+import inspect
+import weakref
+import collections
+
+import six
+
+if six.PY3:
+    from collections.abc import Sequence, Mapping
+else:
+    from collections import Sequence, Mapping
+
+
+class ValidationError(ValueError):
+    """Lists all errors found, as tuples of attribute path and message."""
+
+    def __init__(self, errors):
+        self.errors = list(errors)
+        ValueError.__init__(self, self.describe())
+
+    def describe(self):
+        return "Invalid image definition:\n{}".format('\n'.join(
+            '  {}: {}'.format(path, message)
+            for path, message in self.errors
+        ))
+
+
+def type_name(value):
+    return type(value).__name__
+
+
+def item_path(path, key):
+    return '{}[{!r}]'.format(path, key)
+
+
+def string(value, path, errors):
+    if not isinstance(value, six.string_types):
+        errors.append((path, "expected a string, got {}".format(
+            type_name(value)
+        )))
+    elif not value:
+        errors.append((path, "must not be empty"))
+
+
+def boolean(value, path, errors):
+    if not isinstance(value, bool):
+        errors.append((path, "expected a boolean, got {}".format(
+            type_name(value)
+        )))
+
+
+def optional(check):
+    def check_optional(value, path, errors):
+        if value is not None:
+            check(value, path, errors)
+    return check_optional
+
+
+def sequence_of(check):
+    def check_sequence(value, path, errors):
+        if (not isinstance(value, Sequence) or
+                isinstance(value, six.string_types)):
+            errors.append((path, "expected a sequence, got {}".format(
+                type_name(value)
+            )))
+            return
+        for index, item in enumerate(value):
+            check(item, item_path(path, index), errors)
+    return check_sequence
+
+
+def mapping_of(check_key, check_value):
+    def check_mapping(value, path, errors):
+        if not isinstance(value, Mapping):
+            errors.append((path, "expected a mapping, got {}".format(
+                type_name(value)
+            )))
+            return
+        for key, item in value.items():
+            item_key_path = item_path(path, key)
+            check_key(key, item_key_path, errors)
+            check_value(item, item_key_path, errors)
+    return check_mapping
+
+
+def instance_of(cls):
+    def check_instance(value, path, errors):
+        if not isinstance(value, cls):
+            errors.append((path, "expected a {} instance, got {}".format(
+                cls.__name__,
+                type_name(value)
+            )))
+    return check_instance
+
+
+def text(value, path, errors):
+    if not isinstance(value, six.string_types):
+        errors.append((path, "expected a string, got {}".format(
+            type_name(value)
+        )))
+
+
+check_arguments = sequence_of(text)
+
+
+def command(value, path, errors):
+    """Shell form string or exec form sequence of strings."""
+    if isinstance(value, six.string_types):
+        string(value, path, errors)
+    elif isinstance(value, Sequence) and not value:
+        errors.append((path, "must not be empty"))
+    else:
+        check_arguments(value, path, errors)
+
+
+def port(value, path, errors):
+    if (not isinstance(value, Sequence) or
+            isinstance(value, six.string_types) or
+            len(value) != 2):
+        errors.append((path, "expected a (number, protocol) pair"))
+        return
+    number, protocol = value
+    if (not isinstance(number, six.integer_types) or
+            isinstance(number, bool) or
+            not 0 < number < 2 ** 16):
+        errors.append((
+            item_path(path, 0),
+            "expected a port number, got {!r}".format(number)
+        ))
+    if protocol not in ('tcp', 'udp'):
+        errors.append((
+            item_path(path, 1),
+            "expected 'tcp' or 'udp', got {!r}".format(protocol)
+        ))
+
+
+def host_path(value, path, errors):
+    string(value, path, errors)
+    if isinstance(value, six.string_types) and value:
+        if not os.path.exists(value):
+            errors.append((path, "host path {} does not exist".format(value)))
+
+
+def volume_binding(value, path, errors):
+    if not isinstance(value, Mapping):
+        errors.append((path, "expected a mapping, got {}".format(
+            type_name(value)
+        )))
+        return
+    unknown = set(value) - {'bind', 'ro'}
+    if unknown:
+        errors.append((path, "unknown keys: {}".format(
+            ', '.join(sorted(repr(key) for key in unknown))
+        )))
+    if 'bind' not in value:
+        errors.append((path, "missing 'bind'"))
+    else:
+        string(value['bind'], item_path(path, 'bind'), errors)
+    if 'ro' in value:
+        boolean(value['ro'], item_path(path, 'ro'), errors)
+
+
+schemas = weakref.WeakKeyDictionary()
+
+
+def compile_schema(cls):
+    """
+    Returns the checks of the class's attributes, merging ``_schema`` of
+    the class and its bases. Subclasses may override checks of base attributes,
+    or disable them by giving None.
+    """
+    try:
+        return schemas[cls]
+    except KeyError:
+        pass
+    fields = collections.OrderedDict()
+    for base in reversed(inspect.getmro(cls)):
+        for name, check in vars(base).get('_schema', ()):
+            fields.pop(name, None)
+            fields[name] = check
+    schema = tuple(
+        (name, check) for name, check in fields.items()
+        if check is not None
+    )
+    schemas[cls] = schema
+    return schema
+
+
+def find_errors(definition, prefix=''):
+    """Returns all errors of the definition."""
+    found = []
+    for name, check in compile_schema(definition.__class__):
+        try:
+            value = getattr(definition, name)
+        except AttributeError:
+            found.append((prefix + name, "missing"))
+            continue
+        check(value, prefix + name, found)
+    return found
+
+
+def validate(definition):
+    """Raises ValidationError listing all errors of the definition."""
+    found = find_errors(definition)
+    if found:
+        raise ValidationError(found)
+
+
+def validate_all(definitions):
+    """
+    Validates a mapping of names to definitions, or a sequence of them,
+    raising a single ValidationError for errors of all of them. Attribute
+    paths are prefixed with the name, or position, of their definition.
+    """
+    if isinstance(definitions, Mapping):
+        items = sorted(definitions.items())
+    else:
+        items = enumerate(definitions)
+    found = []
+    for name, definition in items:
+        if inspect.isclass(definition):
+            definition = definition()
+        found.extend(find_errors(definition, prefix='{}: '.format(name)))
+    if found:
+        raise ValidationError(found)
@@ -1,6 +1,7 @@
 # -*- coding: utf-8 -*-
 
 import os
+import sys
 import codecs
 
 from setuptools import setup, find_packages
@@ -11,6 +12,13 @@ here = os.path.abspath(os.path.dirname(__file__))
 with codecs.open(os.path.join(here, 'README.rst'), encoding='utf-8') as readme:
     long_description = readme.read()
 
+install_requires = [
+    'docker-py>=1.7.0',
+    'six>=1.8.0',
+]
+if sys.version_info < (3, 2):
+    install_requires.append('futures>=3.0.0')
+
 
 setup(
     name='docker-loader',
@@ -34,12 +42,10 @@ setup(
         'Topic :: Software Development :: Libraries :: Python Modules',
     ],
     keywords='docker-loader loader docker container image',
-    install_requires=[
-        'docker-py>=1.2.0',
-        'six>=1.8.0',
-    ],
+    install_requires=install_requires,
     extras_require={
         'ansible': ['ansible >=1.9.0, <1.10.0'],
+        'zstd': ['zstandard'],
     },
     tests_require=[
         'nose',
@@ -49,5 +55,10 @@ setup(
     package_data={
         '': ['LICENSE'],
     },
-    include_package_data=True
+    include_package_data=True,
+    entry_points={
+        'console_scripts': [
+            'docker-loader = docker_loader.cli:main',
+        ],
+    }
 )
@@ -0,0 +1,173 @@
+"""
+Benchmarks of the command execution path against a stand-in Docker client.
+
+Run with::
+
+    python -m tests.benchmark_execution [--latency SECONDS] [--commands N]
+
+Measures per-command overhead, stdin transfer and output capture throughput
+and the total cost of a synthetic provisioning run, in both start and exec
+modes. The Ansible connection plugin is benchmarked when Ansible is
+installed.
+"""
+
+from __future__ import print_function
+
+import io
+import sys
+import time
+import logging
+import argparse
+import importlib
+
+from docker_loader.builder import Builder
+from docker_loader.container import Container
+from docker_loader.image_definition import ImageDefinition
+from docker_loader.provisioners.shell import ShellCommand
+
+from tests.stub_client import StubClient
+
+
+MEGABYTE = 1024 * 1024
+
+
+def discard_output(stream, data):
+    pass
+
+
+def measure(function, repeat=1):
+    started = time.time()
+    for _ in range(repeat):
+        function()
+    return time.time() - started
+
+
+def benchmark_command_overhead(client, exec_mode, commands):
+    with Container(client, 'stub', exec_mode=exec_mode) as container:
+        elapsed = measure(lambda: container.execute(['true']), commands)
+    return 'per-command overhead', elapsed / commands * 1000, 'ms'
+
+
+def benchmark_stdin(client, exec_mode, size):
+    payload = b'\0' * size
+    with Container(client, 'stub', exec_mode=exec_mode) as container:
+        elapsed = measure(lambda: container.execute(
+            'cat > /dev/null',
+            stdin=io.BytesIO(payload)
+        ))
+    return 'stdin throughput', size / MEGABYTE / elapsed, 'MB/s'
+
+
+def benchmark_output(client, exec_mode, size):
+    with Container(client, 'stub', exec_mode=exec_mode) as container:
+        elapsed = measure(lambda: container.execute(
+            'head -c {} /dev/zero'.format(size)
+        ))
+    return 'output capture throughput', size / MEGABYTE / elapsed, 'MB/s'
+
+
+def benchmark_provisioning(client, exec_mode, commands):
+
+    class Definition(ImageDefinition):
+        base = 'stub'
+        pull_base = False
+        provisioners = [
+            ShellCommand('echo {}'.format(index))
+            for index in range(commands)
+        ]
+
+    builder = Builder(client, Definition())
+    elapsed = measure(lambda: builder.run(
+        exec_mode=exec_mode,
+        output=discard_output
+    ))
+    return (
+        '{}-command provisioning run'.format(commands),
+        elapsed,
+        's'
+    )
+
+
+def benchmark_ansible_connection(client, exec_mode, commands):
+    try:
+        Connection = importlib.import_module(
+            'docker_loader.provisioners.ansible.ansible_plugins'
+            '.connection_plugins.docker'
+        ).Connection
+    except ImportError:
+        return None
+
+    class Host(object):
+        def __init__(self, container):
+            self.vars = {'container': container}
+
+    class Inventory(object):
+        def __init__(self, container):
+            self.host = Host(container)
+
+        def get_host(self, name):
+            return self.host
+
+    class Runner(object):
+        become = False
+
+    with Container(client, 'stub', exec_mode=exec_mode) as container:
+        runner = Runner()
+        runner.inventory = Inventory(container)
+        connection = Connection(runner, 'stub', None)
+        elapsed = measure(
+            lambda: connection.exec_command('true', '/tmp', None),
+            commands
+        )
+    return 'ansible exec_command overhead', elapsed / commands * 1000, 'ms'
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        '--latency',
+        type=float,
+        default=0.002,
+        help="Simulated daemon round-trip of every API call, in seconds."
+    )
+    parser.add_argument(
+        '--start-latency',
+        type=float,
+        default=0.05,
+        help="Simulated container start time, in seconds."
+    )
+    parser.add_argument('--commands', type=int, default=100)
+    parser.add_argument('--provisioning-commands', type=int, default=500)
+    parser.add_argument('--transfer-size', type=int, default=64 * MEGABYTE)
+    arguments = parser.parse_args(argv)
+    logging.disable(logging.CRITICAL)
+
+    client = StubClient(
+        latency=arguments.latency,
+        start_latency=arguments.start_latency
+    )
+    benchmarks = (
+        (benchmark_command_overhead, arguments.commands),
+        (benchmark_stdin, arguments.transfer_size),
+        (benchmark_output, arguments.transfer_size),
+        (benchmark_provisioning, arguments.provisioning_commands),
+        (benchmark_ansible_connection, arguments.commands),
+    )
+    print('{:<32} {:>12} {:>12}'.format('benchmark', 'start', 'exec'))
+    for benchmark, parameter in benchmarks:
+        results = [
+            benchmark(client, exec_mode, parameter)
+            for exec_mode in (False, True)
+        ]
+        if results[0] is None:
+            continue
+        print('{:<32} {:>9.2f} {unit:<2} {:>9.2f} {unit:<2}'.format(
+            results[0][0],
+            results[0][1],
+            results[1][1],
+            unit=results[0][2]
+        ))
+
+
+if __name__ == '__main__':
+    sys.exit(main())
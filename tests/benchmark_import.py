@@ -0,0 +1,86 @@
+"""
+Benchmarks of import time of docker-loader's modules.
+
+Run with::
+
+    python -m tests.benchmark_import [--repeat N]
+
+Every module is imported in a fresh interpreter, reporting the best time of
+several runs and whether the import loaded docker-py or Ansible.
+"""
+
+from __future__ import print_function
+
+import sys
+import json
+import argparse
+import subprocess
+
+
+MODULES = (
+    'docker_loader',
+    'docker_loader.image_definition',
+    'docker_loader.provisioners.shell',
+    'docker_loader.provisioners.apt',
+    'docker_loader.provisioners.files',
+    'docker_loader.provisioners.ansible',
+    'docker_loader.cli',
+)
+
+SCRIPT = """
+import sys, json, time
+started = time.time()
+import {module}
+elapsed = time.time() - started
+print(json.dumps([
+    elapsed,
+    'docker' in sys.modules,
+    'ansible' in sys.modules,
+]))
+"""
+
+
+def measure_import(module):
+    output = subprocess.check_output([
+        sys.executable,
+        '-c',
+        SCRIPT.format(module=module),
+    ])
+    return json.loads(output.decode('utf-8'))
+
+
+def benchmark_import(module, repeat):
+    try:
+        results = [measure_import(module) for _ in range(repeat)]
+    except subprocess.CalledProcessError:
+        return None
+    return min(result[0] for result in results), results[0][1:]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--repeat', type=int, default=5)
+    arguments = parser.parse_args(argv)
+
+    print('{:<36} {:>12} {:>8} {:>8}'.format(
+        'module',
+        'import',
+        'docker',
+        'ansible'
+    ))
+    for module in MODULES:
+        result = benchmark_import(module, arguments.repeat)
+        if result is None:
+            print('{:<36} {:>12}'.format(module, 'failed'))
+            continue
+        elapsed, (docker_loaded, ansible_loaded) = result
+        print('{:<36} {:>9.1f} ms {:>8} {:>8}'.format(
+            module,
+            elapsed * 1000,
+            'yes' if docker_loaded else 'no',
+            'yes' if ansible_loaded else 'no'
+        ))
+
+
+if __name__ == '__main__':
+    sys.exit(main())
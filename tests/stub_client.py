@@ -0,0 +1,282 @@
+"""
+Stand-in for docker.Client running "container" commands as local processes.
+
+Bind-mounted paths are substituted with their host directories in commands
+and in the command script, so docker-loader's bind-mounted temp directory
+works on the real filesystem. Every API call sleeps for ``latency`` seconds
+and container start additionally for ``start_latency``, simulating the
+daemon round-trip and container start cost. Attach and exec sockets are
+given the ``timeout`` of their reads, as docker.Client does.
+"""
+
+import io
+import os
+import time
+import uuid
+import errno
+import signal
+import struct
+import tarfile
+import threading
+import subprocess
+from socket import socketpair
+
+from docker.errors import APIError
+
+
+class StubContainer(object):
+
+    def __init__(self, image, command):
+        self.image = image
+        self.command = command
+        self.binds = {}
+        self.process = None
+        self.archives = []
+
+
+class StubClient(object):
+
+    SCRIPT_NAME = 'command.sh'
+
+    def __init__(self, latency=0.0, start_latency=0.0, image_size=0,
+            timeout=None):
+        self.latency = latency
+        self.timeout = timeout
+        self.start_latency = start_latency
+        self.image_size = image_size
+        self.containers = {}
+        self.images = {}
+        self.removed_images = set()
+        self.execs = {}
+        self.calls = {}
+        self.lock = threading.Lock()
+
+    def _call(self, name):
+        with self.lock:
+            self.calls[name] = self.calls.get(name, 0) + 1
+        if self.latency:
+            time.sleep(self.latency)
+
+    def _substitute(self, container, text):
+        for host_path, binding in container.binds.items():
+            text = text.replace(binding['bind'], host_path)
+        return text
+
+    def _prepare(self, container, command):
+        for host_path, binding in container.binds.items():
+            script = os.path.join(host_path, self.SCRIPT_NAME)
+            if os.path.exists(script):
+                with open(script, 'r') as script_file:
+                    contents = script_file.read()
+                with open(script, 'w') as script_file:
+                    script_file.write(self._substitute(container, contents))
+        return [self._substitute(container, part) for part in command]
+
+    def _kill(self, process):
+        # Kills the whole process group, as children of the shell, like the
+        # keepalive's sleep, would otherwise outlive it.
+        try:
+            os.killpg(process.pid, signal.SIGKILL)
+        except OSError as error:
+            if error.errno != errno.ESRCH:
+                raise
+        process.wait()
+
+    def _pump(self, source, target):
+        source = getattr(source, '_sock', source)
+        while True:
+            data = source.recv(64 * 1024)
+            if not data:
+                break
+            target.write(data)
+        target.close()
+
+    def create_container(self, image, command, **kwargs):
+        self._call('create_container')
+        container_id = uuid.uuid4().hex * 2
+        self.containers[container_id] = StubContainer(image, command)
+        return {'Id': container_id}
+
+    def start(self, container, binds=None, **kwargs):
+        self._call('start')
+        if self.start_latency:
+            time.sleep(self.start_latency)
+        container = self.containers[container]
+        container.binds = binds or {}
+        container.process = subprocess.Popen(
+            self._prepare(container, container.command),
+            stdin=subprocess.PIPE,
+            preexec_fn=os.setsid
+        )
+
+    def wait(self, container):
+        self._call('wait')
+        return self.containers[container].process.wait()
+
+    def attach_socket(self, container, params=None, ws=False):
+        self._call('attach_socket')
+        process = self.containers[container].process
+        local, remote = socketpair()
+        pump = threading.Thread(
+            target=self._pump,
+            args=(remote, process.stdin)
+        )
+        pump.daemon = True
+        pump.start()
+        local.settimeout(self.timeout)
+        return local
+
+    def exec_create(self, container, cmd, stdout=True, stderr=True,
+            stdin=False, tty=False, privileged=False, user=''):
+        self._call('exec_create')
+        exec_id = uuid.uuid4().hex
+        self.execs[exec_id] = {
+            'container': self.containers[container],
+            'command': cmd,
+            'process': None,
+        }
+        return {'Id': exec_id}
+
+    def exec_start(self, exec_id, detach=False, tty=False, stream=False,
+            socket=False):
+        self._call('exec_start')
+        execution = self.execs[exec_id]
+        container = execution['container']
+        process = subprocess.Popen(
+            self._prepare(container, execution['command']),
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            preexec_fn=os.setsid
+        )
+        execution['process'] = process
+        local, remote = socketpair()
+        lock = threading.Lock()
+
+        def forward(output, stream):
+            for chunk in iter(lambda: os.read(output.fileno(), 65536), b''):
+                with lock:
+                    remote.sendall(struct.pack('>BxxxL', stream, len(chunk)))
+                    remote.sendall(chunk)
+
+        forwarders = [
+            threading.Thread(target=forward, args=(process.stdout, 1)),
+            threading.Thread(target=forward, args=(process.stderr, 2)),
+        ]
+        for forwarder in forwarders:
+            forwarder.daemon = True
+            forwarder.start()
+
+        def finish():
+            self._pump(remote, process.stdin)
+            for forwarder in forwarders:
+                forwarder.join()
+            process.wait()
+            remote.close()
+
+        finisher = threading.Thread(target=finish)
+        finisher.daemon = True
+        finisher.start()
+        local.settimeout(self.timeout)
+        return local
+
+    def exec_inspect(self, exec_id):
+        self._call('exec_inspect')
+        process = self.execs[exec_id]['process']
+        return {
+            'Running': process.poll() is None,
+            'ExitCode': process.returncode,
+        }
+
+    def put_archive(self, container, path, data):
+        self._call('put_archive')
+        if not isinstance(data, bytes):
+            data = b''.join(data)
+        self.containers[container].archives.append((path, data))
+        return True
+
+    def get_archive(self, container, path):
+        self._call('get_archive')
+        data = io.BytesIO()
+        with tarfile.open(fileobj=data, mode='w') as archive:
+            archive.add(path, arcname=os.path.basename(path.rstrip('/')))
+        data.seek(0)
+        return data, {'name': os.path.basename(path)}
+
+    def export(self, container):
+        self._call('export')
+        data = io.BytesIO()
+        with tarfile.open(fileobj=data, mode='w'):
+            pass
+        data.seek(0)
+        return data
+
+    def import_image(self, src=None, repository=None, tag=None, image=None,
+            changes=None, stream_src=False):
+        self._call('import_image')
+        src.read()
+        image_id = 'sha256:' + uuid.uuid4().hex * 2
+        self.images[image_id] = {
+            'Id': image_id,
+            'Config': {},
+            'Changes': changes,
+            'Size': self.image_size,
+            'VirtualSize': self.image_size,
+        }
+        return '{{"status":"{}"}}\r\n'.format(image_id)
+
+    def remove_container(self, container, v=False, link=False, force=False):
+        self._call('remove_container')
+        removed = self.containers.pop(container)
+        processes = [removed.process] + [
+            execution['process'] for execution in self.execs.values()
+            if execution['container'] is removed
+        ]
+        for process in processes:
+            if process is not None:
+                self._kill(process)
+
+    def commit(self, container, repository=None, tag=None, message=None,
+            author=None, conf=None):
+        self._call('commit')
+        image_id = uuid.uuid4().hex * 2
+        self.images[image_id] = {
+            'Id': image_id,
+            'Config': dict({'User': '', 'Cmd': ['/bin/sh']}, **(conf or {})),
+            'Size': 0,
+            'VirtualSize': 0,
+        }
+        return {'Id': image_id}
+
+    def inspect_image(self, image):
+        self._call('inspect_image')
+        if image in self.removed_images:
+            raise APIError('No such image', None, explanation=image)
+        if image not in self.images:
+            self.images[image] = {
+                'Id': image,
+                'Config': {'User': '', 'Cmd': ['/bin/sh']},
+                'Size': 0,
+                'VirtualSize': 0,
+            }
+        return self.images[image]
+
+    def remove_image(self, image, force=False, noprune=False):
+        self._call('remove_image')
+        if self.images.pop(image, None) is None:
+            raise APIError('No such image', None, explanation=image)
+        self.removed_images.add(image)
+
+    def tag(self, image, repository, tag=None, force=False):
+        self._call('tag')
+        self.images[':'.join((repository, tag or 'latest'))] = (
+            self.inspect_image(image)
+        )
+
+    def pull(self, repository, tag=None, stream=False, **kwargs):
+        self._call('pull')
+        return iter([])
+
+    def get_image(self, image):
+        self._call('get_image')
+        return io.BytesIO(b'\0' * self.image_size)
@@ -0,0 +1,71 @@
+import time
+import threading
+import unittest
+
+from docker_loader.provisioners import ansible
+from docker_loader.provisioners.ansible import AnsibleGroup
+
+
+class FakeContainer(object):
+
+    def __init__(self, name):
+        self.id = name * 12
+
+
+class AnsibleGroupTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.runs = []
+        self.run_playbook = ansible.run_playbook
+        ansible.run_playbook = self.record_run
+        self.group = AnsibleGroup('site.yml', window=30)
+        self.members = [
+            self.group.member(role=role) for role in ('a', 'b', 'c')
+        ]
+
+    def tearDown(self):
+        ansible.run_playbook = self.run_playbook
+
+    def record_run(self, playbook, hosts, **options):
+        self.runs.append(sorted(hosts))
+        return dict(
+            (host, {'unreachable': 0, 'failures': 0}) for host in hosts
+        )
+
+    def provision_all(self, members):
+        threads = [
+            threading.Thread(
+                target=member.provision,
+                args=(FakeContainer(member.host_variables['role']),)
+            )
+            for member in members
+        ]
+        started = time.time()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return time.time() - started
+
+    def test_single_run(self):
+        self.assertLess(self.provision_all(self.members), 5)
+        self.assertEqual(self.runs, [['a' * 12, 'b' * 12, 'c' * 12]])
+
+    def test_withdrawn_member(self):
+        self.members[2].skip()
+        self.assertLess(self.provision_all(self.members[:2]), 5)
+        self.assertEqual(self.runs, [['a' * 12, 'b' * 12]])
+
+    def test_reuse(self):
+        self.provision_all(self.members)
+        self.members[0].skip()
+        self.assertLess(self.provision_all(self.members[1:]), 5)
+        self.assertEqual(self.runs, [
+            ['a' * 12, 'b' * 12, 'c' * 12],
+            ['b' * 12, 'c' * 12],
+        ])
+
+    def test_window(self):
+        self.group.window = 0.2
+        self.provision_all(self.members[:2])
+        self.assertEqual(self.runs, [['a' * 12, 'b' * 12]])
@@ -0,0 +1,102 @@
+import unittest
+
+from docker_loader.provisioners import apt
+from docker_loader.provisioners.shell import ShellCommand
+
+
+class RecordingContainer(object):
+    """Records commands run in it, without any APT cache mounted."""
+
+    build_volumes = {}
+
+    def __init__(self):
+        self.commands = []
+
+    def run(self, command):
+        self.commands.append(command)
+
+    def batch(self):
+        return RecordingBatch(self)
+
+
+class RecordingBatch(object):
+
+    def __init__(self, container):
+        self.container = container
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        pass
+
+    def add(self, command):
+        self.container.commands.append(command)
+
+
+class CoalesceTestCase(unittest.TestCase):
+
+    def test_adjacent_installs_merged(self):
+        update = apt.AptUpdate()
+        shell = ShellCommand('true')
+        provisioners = apt.coalesce([
+            update,
+            apt.AptInstall(['python3']),
+            apt.AptInstall(['gcc', 'python3'], build_only=True),
+            shell,
+            apt.AptInstall(['curl']),
+        ])
+        self.assertEqual(len(provisioners), 4)
+        self.assertIs(provisioners[0], update)
+        self.assertIsInstance(provisioners[1], apt.AptTransaction)
+        self.assertEqual(provisioners[1].packages, ['python3', 'gcc'])
+        self.assertEqual(provisioners[1].build_only_packages, ['gcc'])
+        self.assertIs(provisioners[2], shell)
+        self.assertIs(type(provisioners[3]), apt.AptInstall)
+
+    def test_recommends_split_runs(self):
+        provisioners = apt.coalesce([
+            apt.AptInstall(['python3']),
+            apt.AptInstall(['gcc'], install_recommends=False),
+            apt.AptInstall(['make'], install_recommends=False),
+        ])
+        self.assertEqual(len(provisioners), 2)
+        self.assertIs(type(provisioners[0]), apt.AptInstall)
+        self.assertEqual(provisioners[1].packages, ['gcc', 'make'])
+        self.assertFalse(provisioners[1].install_recommends)
+
+    def test_recommends_override(self):
+        provisioners = apt.coalesce([
+            apt.AptInstall(['python3']),
+            apt.AptInstall(['gcc']),
+        ], install_recommends=False)
+        self.assertEqual(len(provisioners), 1)
+        self.assertFalse(provisioners[0].install_recommends)
+        single = apt.coalesce([apt.AptInstall(['gcc'])], False)
+        self.assertIsInstance(single[0], apt.AptTransaction)
+
+    def test_transaction_commands(self):
+        transaction, = apt.coalesce([
+            apt.AptInstall(['python3']),
+            apt.AptInstall(['gcc', 'python3'], build_only=True),
+            apt.AptInstall(['make'], build_only=True),
+        ])
+        container = RecordingContainer()
+        transaction.provision(container)
+        transaction.cleanup(container)
+        self.assertEqual(container.commands, [
+            ['apt-get', 'install', '-y', 'python3', 'gcc', 'make'],
+            ['apt-get', 'purge', '-y', 'gcc', 'make'],
+            ['apt-get', 'autoremove', '-y'],
+        ])
+
+    def test_fingerprint_follows_installs(self):
+        first = apt.coalesce([
+            apt.AptInstall(['python3']),
+            apt.AptInstall(['gcc'], build_only=True),
+        ])[0]
+        second = apt.coalesce([
+            apt.AptInstall(['python3']),
+            apt.AptInstall(['gcc']),
+        ])[0]
+        self.assertNotEqual(first.fingerprint(), second.fingerprint())
@@ -0,0 +1,76 @@
+import io
+import os
+import shutil
+import tarfile
+import tempfile
+import unittest
+
+from docker_loader.archive import collect_files, extract_members, iter_tar
+
+
+class ArchiveTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.source = os.path.join(self.directory, 'source')
+        os.makedirs(os.path.join(self.source, 'nested', 'deeper'))
+        self.files = {
+            'empty': b'',
+            'small': b'contents\n',
+            'nested/block': b'x' * tarfile.BLOCKSIZE,
+            'nested/deeper/large': os.urandom(3 * 1024 * 1024 + 7),
+        }
+        for name, contents in self.files.items():
+            with open(os.path.join(self.source, name), 'wb') as output:
+                output.write(contents)
+        os.symlink('small', os.path.join(self.source, 'link'))
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def archive(self, **options):
+        return io.BytesIO(b''.join(iter_tar(
+            collect_files(self.source, **options),
+            chunk_size=64 * 1024
+        )))
+
+    def test_archive_members(self):
+        with tarfile.open(fileobj=self.archive(), mode='r') as archive:
+            members = dict(
+                (member.name, member) for member in archive.getmembers()
+            )
+            self.assertEqual(sorted(members), sorted(
+                list(self.files) +
+                ['link', 'nested', 'nested/deeper']
+            ))
+            self.assertTrue(members['nested'].isdir())
+            self.assertTrue(members['link'].issym())
+            self.assertEqual(members['link'].linkname, 'small')
+            self.assertEqual(members['small'].uid, 0)
+            for name, contents in self.files.items():
+                self.assertEqual(archive.extractfile(name).read(), contents)
+
+    def test_round_trip(self):
+        destination = os.path.join(self.directory, 'large')
+        small = io.BytesIO()
+        extracted = extract_members(self.archive(), {
+            './nested/deeper/large': destination,
+            'small': small,
+            'empty': io.BytesIO(),
+            'nested': io.BytesIO(),
+            'missing': io.BytesIO(),
+        }, chunk_size=1000)
+        self.assertEqual(extracted, {'nested/deeper/large', 'small', 'empty'})
+        self.assertEqual(small.getvalue(), self.files['small'])
+        with open(destination, 'rb') as extracted_file:
+            self.assertEqual(
+                extracted_file.read(),
+                self.files['nested/deeper/large']
+            )
+
+    def test_exclude(self):
+        extracted = extract_members(self.archive(exclude=['nested']), {
+            'small': io.BytesIO(),
+            'nested/block': io.BytesIO(),
+        })
+        self.assertEqual(extracted, {'small'})
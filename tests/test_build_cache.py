@@ -0,0 +1,146 @@
+import os
+import time
+import shutil
+import tempfile
+import unittest
+
+from docker_loader.builder import Builder
+from docker_loader.cache import BuildCache, FileHashCache
+from docker_loader.image_definition import ImageDefinition
+from docker_loader.provisioners.shell import ShellCommand
+
+from tests.stub_client import StubClient
+from tests.test_scheduler import RecordingProvisioner
+
+
+def ignore_output(stream, data):
+    pass
+
+
+class CachedImage(ImageDefinition):
+    base = 'stub'
+    pull_base = False
+    provisioners = [
+        ShellCommand('echo first'),
+        ShellCommand('echo second'),
+    ]
+
+
+class ChangedImage(CachedImage):
+    provisioners = [
+        ShellCommand('echo first'),
+        ShellCommand('echo changed'),
+    ]
+
+
+class BuildCacheTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.client = StubClient()
+        self.cache = self.open_cache()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def open_cache(self):
+        return BuildCache(
+            self.directory,
+            hash_cache=FileHashCache(os.path.join(self.directory, 'hashes'))
+        )
+
+    def builder(self, definition):
+        return Builder(self.client, definition(), cache=self.cache)
+
+    def build(self, definition):
+        return self.builder(definition).run(output=ignore_output)
+
+    def test_resume(self):
+        self.assertEqual(self.builder(CachedImage).resume(), ('stub', 0))
+        self.build(CachedImage)
+        self.assertEqual(len(self.cache), 2)
+        image, cached = self.builder(CachedImage).resume()
+        self.assertEqual(cached, 2)
+        self.assertEqual(image, list(self.cache)[-1][1]['image'])
+
+    def test_resume_after_change(self):
+        self.build(CachedImage)
+        image, cached = self.builder(ChangedImage).resume()
+        self.assertEqual(cached, 1)
+        self.assertEqual(image, list(self.cache)[0][1]['image'])
+
+    def test_resume_across_instances(self):
+        self.build(CachedImage)
+        self.cache = self.open_cache()
+        self.assertEqual(self.builder(CachedImage).resume()[1], 2)
+
+    def test_resume_after_environment_change(self):
+
+        class EnvironmentImage(CachedImage):
+            environment = {'APP': 'two'}
+
+        self.build(CachedImage)
+        self.assertEqual(self.builder(EnvironmentImage).resume()[1], 0)
+
+    def test_resume_after_volume_change(self):
+        volume = os.path.join(self.directory, 'volume')
+        os.mkdir(volume)
+
+        class VolumeImage(CachedImage):
+            build_volumes = {volume: {'bind': '/volume'}}
+
+        with open(os.path.join(volume, 'file'), 'w') as volume_file:
+            volume_file.write('first')
+        self.build(VolumeImage)
+        self.assertEqual(self.builder(VolumeImage).resume()[1], 2)
+        with open(os.path.join(volume, 'file'), 'w') as volume_file:
+            volume_file.write('second, longer')
+        self.assertEqual(self.builder(VolumeImage).resume()[1], 0)
+
+    def test_resumed_provisioners_skipped(self):
+
+        class RecordedImage(CachedImage):
+            provisioners = [
+                ShellCommand('echo first'),
+                RecordingProvisioner('recorded'),
+            ]
+
+        del RecordingProvisioner.provisioned[:]
+        del RecordingProvisioner.skipped[:]
+        self.build(RecordedImage)
+        self.build(RecordedImage)
+        self.assertEqual(RecordingProvisioner.provisioned, ['recorded'])
+        self.assertEqual(RecordingProvisioner.skipped, ['recorded'])
+
+    def test_resume_without_image(self):
+        self.build(CachedImage)
+        for key, entry in self.cache:
+            self.client.remove_image(entry['image'])
+        self.assertEqual(self.builder(CachedImage).resume()[1], 0)
+        self.assertEqual(len(self.cache), 1)
+
+    def test_prune_by_age(self):
+        self.build(CachedImage)
+        (old_key, old), (new_key, new) = list(self.cache)
+        self.cache.entries[new_key]['used'] = time.time() - 3600
+        removed = self.cache.prune(self.client, max_age=60)
+        self.assertEqual(removed, [new_key])
+        self.assertEqual([key for key, entry in self.cache], [old_key])
+        self.assertEqual(self.client.removed_images, {new['image']})
+
+    def test_prune_removes_descendants(self):
+        self.build(CachedImage)
+        (old_key, old), (new_key, new) = list(self.cache)
+        self.cache.entries[old_key]['used'] = time.time() - 3600
+        removed = self.cache.prune(self.client, max_age=60)
+        self.assertEqual(removed, [new_key, old_key])
+        self.assertEqual(len(self.open_cache()), 0)
+        self.assertEqual(
+            self.client.removed_images,
+            {old['image'], new['image']}
+        )
+
+    def test_clear(self):
+        self.build(CachedImage)
+        self.assertEqual(len(self.cache.clear(self.client)), 2)
+        self.assertEqual(len(self.cache), 0)
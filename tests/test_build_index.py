@@ -0,0 +1,115 @@
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+import subprocess
+
+from docker_loader.cache import BuildIndex, FileHashCache
+from docker_loader.image_definition import ImageDefinition
+from docker_loader.provisioners.shell import ShellCommand
+
+from tests.stub_client import StubClient
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+BUILD_SCRIPT = """
+import sys
+from docker_loader.builder import Builder
+from docker_loader.cache import BuildIndex, FileHashCache
+from tests.stub_client import StubClient
+from tests.test_build_index import IndexedImage
+index = BuildIndex(sys.argv[1], hash_cache=FileHashCache(sys.argv[2]))
+builder = Builder(StubClient(), IndexedImage(), index=index)
+print(builder.run(output=lambda stream, data: None).id)
+"""
+
+
+class IndexedImage(ImageDefinition):
+    base = 'stub'
+    pull_base = False
+    environment = {'LANG': 'C.UTF-8'}
+    provisioners = [
+        ShellCommand('true'),
+    ]
+
+
+class BuildIndexTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.hashes = os.path.join(self.directory, 'hashes.json')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def index(self):
+        return BuildIndex(
+            self.directory,
+            hash_cache=FileHashCache(self.hashes)
+        )
+
+    def build_in_process(self):
+        output = subprocess.check_output(
+            [sys.executable, '-c', BUILD_SCRIPT, self.directory, self.hashes],
+            cwd=ROOT
+        )
+        return output.decode('utf-8').strip()
+
+    def test_fingerprint_is_stable(self):
+        index = self.index()
+        self.assertEqual(
+            index.fingerprint(IndexedImage(), 'base-id'),
+            index.fingerprint(IndexedImage(), 'base-id')
+        )
+
+    def test_fingerprint_depends_on_attributes(self):
+
+        class ChangedImage(IndexedImage):
+            environment = {'LANG': 'en_US.UTF-8'}
+
+        index = self.index()
+        self.assertNotEqual(
+            index.fingerprint(IndexedImage(), 'base-id'),
+            index.fingerprint(ChangedImage(), 'base-id')
+        )
+
+    def test_fingerprint_depends_on_base(self):
+        index = self.index()
+        self.assertNotEqual(
+            index.fingerprint(IndexedImage(), 'base-id'),
+            index.fingerprint(IndexedImage(), 'other-base-id')
+        )
+
+    def test_fingerprint_depends_on_volume_contents(self):
+        volume = os.path.join(self.directory, 'volume')
+        os.mkdir(volume)
+
+        class VolumeImage(IndexedImage):
+            build_volumes = {volume: {'bind': '/volume'}}
+
+        index = self.index()
+        with open(os.path.join(volume, 'file'), 'w') as volume_file:
+            volume_file.write('first')
+        first = index.fingerprint(VolumeImage(), 'base-id')
+        self.assertEqual(index.fingerprint(VolumeImage(), 'base-id'), first)
+        with open(os.path.join(volume, 'file'), 'w') as volume_file:
+            volume_file.write('second, longer')
+        self.assertNotEqual(index.fingerprint(VolumeImage(), 'base-id'), first)
+
+    def test_lookup_of_removed_image(self):
+        client = StubClient()
+        client.inspect_image('image-id')
+        index = self.index()
+        index.store('fingerprint', 'image-id', 'IndexedImage')
+        self.assertEqual(index.lookup(client, 'fingerprint'), 'image-id')
+        client.remove_image('image-id')
+        self.assertIsNone(index.lookup(client, 'fingerprint'))
+        self.assertEqual(len(index), 0)
+
+    def test_hit_across_processes(self):
+        first = self.build_in_process()
+        second = self.build_in_process()
+        self.assertEqual(first, second)
+        self.assertEqual(len(self.index()), 1)
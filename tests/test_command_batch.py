@@ -0,0 +1,124 @@
+import time
+import unittest
+
+from docker_loader.container import (
+    BatchOutput,
+    Container,
+    ContainerCommandError,
+)
+
+from tests.stub_client import StubClient
+
+
+def ignore_output(stream, data):
+    pass
+
+
+class CommandBatchTestCase(unittest.TestCase):
+
+    exec_mode = False
+
+    def setUp(self):
+        self.container = Container(
+            StubClient(),
+            'stub',
+            exec_mode=self.exec_mode,
+            output=ignore_output
+        )
+        self.container.create()
+
+    def tearDown(self):
+        self.container.remove()
+
+    def test_results(self):
+        batch = self.container.batch()
+        batch.add('echo first')
+        batch.add(['sh', '-c', 'echo second >&2'])
+        results = batch.run()
+        self.assertEqual(
+            [result.exit_code for result in results],
+            [0, 0]
+        )
+        self.assertEqual(results[0].stdout, 'first\n')
+        self.assertEqual(results[0].stderr, '')
+        self.assertEqual(results[1].stdout, '')
+        self.assertEqual(results[1].stderr, 'second\n')
+
+    def test_output_streamed(self):
+        received = []
+
+        def sink(stream, text):
+            received.append((time.time(), stream, text))
+
+        batch = self.container.batch()
+        batch.add('echo first')
+        batch.add('sleep 0.5')
+        batch.add('echo second; echo error >&2')
+        batch.run(output=sink)
+        finished = time.time()
+        streams = {'stdout': '', 'stderr': ''}
+        for _, stream, text in received:
+            streams[stream] += text
+        self.assertEqual(streams, {
+            'stdout': 'first\nsecond\n',
+            'stderr': 'error\n',
+        })
+        self.assertGreater(finished - received[0][0], 0.3)
+
+    def test_output_bounded(self):
+        self.container.output_buffer_size = 4
+        batch = self.container.batch()
+        batch.add('echo first line')
+        batch.add('echo second line')
+        results = batch.run()
+        self.assertEqual(results[0].stdout, 'ine\n')
+        self.assertEqual(results[1].stdout, 'ine\n')
+
+    def test_empty(self):
+        self.assertEqual(self.container.batch().run(), [])
+
+    def test_failure_stops_batch(self):
+        batch = self.container.batch()
+        batch.add('echo first')
+        batch.add('echo failing; exit 3')
+        batch.add('echo never')
+        with self.assertRaises(ContainerCommandError) as context:
+            batch.run()
+        self.assertEqual(context.exception.command, 'echo failing; exit 3')
+        self.assertEqual(context.exception.exit_code, 3)
+        self.assertEqual(context.exception.stdout, 'failing\n')
+        self.assertEqual(len(batch.execute(output=ignore_output)), 2)
+
+    def test_aborted_script(self):
+        batch = self.container.batch()
+        batch.add('echo first')
+        batch.add('echo "unterminated')
+        with self.assertRaises(ContainerCommandError) as context:
+            batch.run()
+        self.assertEqual(context.exception.command, 'echo "unterminated')
+        self.assertNotEqual(context.exception.exit_code, 0)
+        self.assertIn('nterminated', context.exception.stderr)
+
+
+class ExecModeCommandBatchTestCase(CommandBatchTestCase):
+
+    exec_mode = True
+
+
+class BatchOutputTestCase(unittest.TestCase):
+
+    def test_markers_split_across_chunks(self):
+        received = []
+        output = BatchOutput(
+            '\x1emark:',
+            'utf-8',
+            sink=lambda stream, text: received.append(text)
+        )
+        text = 'first\x1emark:0\n\x1e\x1emark:3\nnever'
+        for character in text:
+            output('stdout', character)
+        output.close()
+        self.assertEqual(''.join(received), 'first\x1enever')
+        self.assertEqual(output.exit_codes, [0, 3])
+        self.assertEqual(output.output('stdout', 1), '\x1e')
+        self.assertEqual(output.output('stdout', 2), 'never')
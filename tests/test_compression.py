@@ -0,0 +1,97 @@
+import io
+import os
+import gzip
+import shutil
+import tempfile
+import unittest
+
+from docker_loader.compression import ParallelGzipWriter, zstandard
+from docker_loader.image import Image, write_archive
+
+from tests.stub_client import StubClient
+
+
+DATA = os.urandom(256 * 1024) + b'compressible ' * 50000
+
+
+def gunzip(data):
+    with gzip.GzipFile(fileobj=io.BytesIO(data)) as archive:
+        return archive.read()
+
+
+class ParallelGzipWriterTestCase(unittest.TestCase):
+
+    def test_members_in_order(self):
+        output = io.BytesIO()
+        with ParallelGzipWriter(output, chunk_size=1000, workers=4) as writer:
+            for start in range(0, len(DATA), 777):
+                writer.write(DATA[start:start + 777])
+        self.assertEqual(gunzip(output.getvalue()), DATA)
+
+    def test_callable_output(self):
+        chunks = []
+        with ParallelGzipWriter(chunks.append, chunk_size=64 * 1024) as writer:
+            for start in range(0, len(DATA), 4096):
+                writer.write(DATA[start:start + 4096])
+        self.assertGreater(len(chunks), 1)
+        self.assertEqual(gunzip(b''.join(chunks)), DATA)
+
+    def test_empty(self):
+        output = io.BytesIO()
+        ParallelGzipWriter(output).close()
+        self.assertEqual(output.getvalue(), b'')
+
+
+class WriteArchiveTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_uncompressed(self):
+        output = io.BytesIO()
+        size = write_archive(io.BytesIO(DATA), output, chunk_size=4096)
+        self.assertEqual(size, len(DATA))
+        self.assertEqual(output.getvalue(), DATA)
+
+    def test_gzip_file(self):
+        path = os.path.join(self.directory, 'image.tar.gz')
+        size = write_archive(
+            io.BytesIO(DATA),
+            path,
+            compress=True,
+            chunk_size=64 * 1024,
+            workers=3,
+            level=1
+        )
+        self.assertEqual(size, len(DATA))
+        with gzip.open(path, 'rb') as archive:
+            self.assertEqual(archive.read(), DATA)
+
+    @unittest.skipIf(zstandard is None, "zstandard is not installed")
+    def test_zstd(self):
+        output = io.BytesIO()
+        write_archive(io.BytesIO(DATA), output, compress='zstd')
+        decompressor = zstandard.ZstdDecompressor()
+        self.assertEqual(
+            decompressor.decompressobj().decompress(output.getvalue()),
+            DATA
+        )
+
+    def test_unknown_compression(self):
+        self.assertRaises(
+            ValueError,
+            write_archive,
+            io.BytesIO(DATA),
+            io.BytesIO(),
+            compress='lzma'
+        )
+
+    def test_image_save(self):
+        client = StubClient(image_size=300 * 1024)
+        client.inspect_image('stub')
+        chunks = []
+        Image(client, 'stub').save(chunks.append, compress='gzip')
+        self.assertEqual(gunzip(b''.join(chunks)), b'\0' * 300 * 1024)
@@ -0,0 +1,85 @@
+import time
+import unittest
+
+from docker_loader.container import Container, OutputCapture
+from docker_loader.utils import STDOUT, STDERR
+
+from tests.stub_client import StubClient
+
+
+class ExecModeTestCase(unittest.TestCase):
+
+    def test_quiet_command_outlives_socket_timeout(self):
+        container = Container(
+            StubClient(timeout=0.2),
+            'stub',
+            exec_mode=True,
+            output=lambda stream, data: None
+        )
+        with container:
+            exit_code, stdout, stderr = container.execute(
+                'sleep 0.5; echo done'
+            )
+        self.assertEqual(exit_code, 0)
+        self.assertEqual(stdout, 'done\n')
+
+
+class OutputCaptureTestCase(unittest.TestCase):
+
+    def test_split_characters(self):
+        received = []
+        capture = OutputCapture(
+            'utf-8',
+            sink=lambda stream, text: received.append((stream, text)),
+            buffer_size=3
+        )
+        data = u'za\u017c\u00f3\u0142\u0107'.encode('utf-8')
+        for index in range(len(data)):
+            capture.write(STDOUT, data[index:index + 1])
+        capture.write(STDERR, b'\xc5')
+        capture.close()
+        self.assertEqual(
+            u''.join(text for stream, text in received if stream == 'stdout'),
+            u'za\u017c\u00f3\u0142\u0107'
+        )
+        self.assertEqual(received[-1], ('stderr', u'\ufffd'))
+        self.assertEqual(capture.getvalue(STDOUT), u'\ufffd\u0107')
+        self.assertEqual(capture.size, len(data) + 1)
+
+
+class StreamingTestCase(unittest.TestCase):
+
+    exec_mode = False
+
+    def test_output_streamed(self):
+        received = []
+
+        def sink(stream, text):
+            received.append((time.time(), stream, text))
+
+        container = Container(
+            StubClient(),
+            'stub',
+            exec_mode=self.exec_mode,
+            output_buffer_size=4
+        )
+        with container:
+            exit_code, stdout, stderr = container.execute(
+                'echo first; sleep 0.5; echo second; echo error >&2',
+                output=sink
+            )
+        finished = time.time()
+        self.assertEqual(exit_code, 0)
+        self.assertEqual(stdout, 'ond\n')
+        self.assertEqual(stderr, 'ror\n')
+        self.assertEqual(received[0][1:], ('stdout', 'first\n'))
+        self.assertGreater(finished - received[0][0], 0.3)
+        self.assertEqual(
+            ''.join(text for _, name, text in received if name == 'stdout'),
+            'first\nsecond\n'
+        )
+
+
+class ExecModeStreamingTestCase(StreamingTestCase):
+
+    exec_mode = True
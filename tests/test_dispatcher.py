@@ -0,0 +1,142 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from docker.errors import APIError
+
+from docker_loader.dispatcher import Dispatcher
+from docker_loader.image_definition import ImageDefinition
+from docker_loader.provisioners.shell import ShellCommand
+
+from tests.stub_client import StubClient
+
+
+class HostClient(StubClient):
+    """
+    Stub client of a host having only the given images, counting its
+    containers.
+    """
+
+    def __init__(self, images=None, **options):
+        StubClient.__init__(self, **options)
+        self.strict = images is not None
+        for image in images or ():
+            StubClient.inspect_image(self, image)
+        self.active = 0
+        self.most_active = 0
+        self.created = 0
+
+    def inspect_image(self, image):
+        if image + ':latest' in self.images:
+            image += ':latest'
+        if self.strict and image not in self.images:
+            raise APIError('No such image', None, explanation=image)
+        return StubClient.inspect_image(self, image)
+
+    def create_container(self, image, command, **kwargs):
+        with self.lock:
+            self.active += 1
+            self.created += 1
+            self.most_active = max(self.most_active, self.active)
+        return StubClient.create_container(self, image, command, **kwargs)
+
+    def remove_container(self, container, **kwargs):
+        StubClient.remove_container(self, container, **kwargs)
+        with self.lock:
+            self.active -= 1
+
+
+class BaseImage(ImageDefinition):
+    base = 'stub'
+    pull_base = False
+    provisioners = [
+        ShellCommand('sleep 0.1'),
+    ]
+
+
+class WebImage(BaseImage):
+    base = 'acme/base'
+
+
+class DispatcherTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.cache_home = os.environ.get('XDG_CACHE_HOME')
+        os.environ['XDG_CACHE_HOME'] = self.directory
+
+    def tearDown(self):
+        if self.cache_home is None:
+            del os.environ['XDG_CACHE_HOME']
+        else:
+            os.environ['XDG_CACHE_HOME'] = self.cache_home
+        shutil.rmtree(self.directory)
+
+    def dispatch(self, clients, definitions, **options):
+        results = Dispatcher(
+            clients,
+            definitions,
+            output=lambda stream, data: None,
+            **options
+        ).run()
+        for name, result in results.items():
+            self.assertTrue(result.succeeded, str(result))
+        return dict(
+            (name, result.host.name) for name, result in results.items()
+        )
+
+    def test_base_image_affinity(self):
+        placements = self.dispatch({
+            'a': HostClient(images=[]),
+            'b': HostClient(images=['stub']),
+        }, {'acme/base': BaseImage})
+        self.assertEqual(placements, {'acme/base:latest': 'b'})
+
+    def test_cache_affinity(self):
+        b = HostClient()
+        self.dispatch({'b': b}, {'acme/base': BaseImage}, cache=True)
+        placements = self.dispatch({
+            'a': HostClient(),
+            'b': b,
+        }, {'acme/base': BaseImage}, cache=True)
+        self.assertEqual(placements, {'acme/base:latest': 'b'})
+
+    def test_dependants_built_on_base_host(self):
+        placements = self.dispatch({
+            'a': HostClient(images=['acme/base:latest']),
+            'b': HostClient(images=['stub']),
+        }, {
+            'acme/base': BaseImage,
+            'acme/web': WebImage,
+        })
+        self.assertEqual(placements, {
+            'acme/base:latest': 'b',
+            'acme/web:latest': 'b',
+        })
+
+    def test_capacity(self):
+        clients = {
+            'a': HostClient(),
+            'b': HostClient(),
+        }
+        definitions = dict(
+            ('acme/image{}'.format(number), BaseImage)
+            for number in range(6)
+        )
+        placements = self.dispatch(clients, definitions, capacity=2)
+        self.assertEqual(set(placements.values()), {'a', 'b'})
+        for client in clients.values():
+            self.assertEqual(client.most_active, 2)
+            self.assertEqual(client.active, 0)
+        self.assertEqual(
+            sum(client.created for client in clients.values()),
+            6
+        )
+
+    def test_sequence_of_clients(self):
+        placements = self.dispatch(
+            [HostClient(images=[]), HostClient(images=['stub'])],
+            {'acme/base': BaseImage}
+        )
+        self.assertEqual(placements, {'acme/base:latest': 'host1'})
@@ -0,0 +1,77 @@
+import time
+import unittest
+
+from docker_loader.pool import ContainerPool
+
+from tests.stub_client import StubClient
+
+
+def wait_until(condition, timeout=5):
+    deadline = time.time() + timeout
+    while not condition():
+        if time.time() > deadline:
+            raise AssertionError("Condition not met in time.")
+        time.sleep(0.01)
+
+
+class ContainerPoolTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.client = StubClient()
+
+    def pool(self, **options):
+        pool = ContainerPool(self.client, **options)
+        self.addCleanup(pool.close)
+        return pool
+
+    def test_refill(self):
+        pool = self.pool(size=2)
+        pool.prepare('stub', exec_mode=True)
+        wait_until(lambda: len(pool) == 2)
+        container = pool.acquire('stub', exec_mode=True, output=True)
+        self.addCleanup(container.remove)
+        self.assertIsNotNone(container.id)
+        self.assertTrue(container.output)
+        wait_until(lambda: len(pool) == 2)
+        stats = pool.stats()
+        self.assertEqual(stats['hits'], 1)
+        self.assertEqual(stats['misses'], 0)
+        self.assertEqual(stats['created'], 3)
+
+    def test_miss(self):
+        pool = self.pool()
+        container = pool.acquire('stub', exec_mode=True)
+        self.assertIsNone(container.id)
+        self.assertEqual(pool.stats()['misses'], 1)
+        wait_until(lambda: len(pool) == 1)
+        other = pool.acquire('stub', exec_mode=False)
+        self.assertIsNone(other.id)
+        self.assertEqual(pool.stats()['hit_rate'], 0.0)
+
+    def test_limits(self):
+        pool = self.pool(size=3, max_containers=4)
+        pool.prepare('stub', exec_mode=True)
+        pool.prepare('stub', exec_mode=False)
+        wait_until(lambda: len(pool) == 4)
+        time.sleep(0.1)
+        self.assertEqual(len(pool), 4)
+        self.assertEqual(len(self.client.containers), 4)
+
+    def test_idle_containers_evicted(self):
+        pool = self.pool(idle_timeout=0.2)
+        pool.prepare('stub', exec_mode=True)
+        wait_until(lambda: pool.stats()['created'] == 1)
+        wait_until(lambda: pool.stats()['evicted'] == 1)
+        self.assertEqual(len(pool), 0)
+        self.assertEqual(self.client.containers, {})
+
+    def test_close(self):
+        pool = self.pool(size=2)
+        pool.prepare('stub', exec_mode=True)
+        wait_until(lambda: len(pool) == 2)
+        pool.close()
+        self.assertEqual(len(pool), 0)
+        self.assertEqual(self.client.containers, {})
+        self.assertFalse(pool.evictor.is_alive())
+        pool.prepare('stub', exec_mode=True)
+        self.assertEqual(len(pool), 0)
@@ -0,0 +1,63 @@
+import shutil
+import tempfile
+import threading
+import unittest
+
+from docker_loader.pull_manager import PullManager
+
+from tests.stub_client import StubClient
+
+
+class PullManagerTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.client = StubClient(latency=0.05)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def manager(self, **options):
+        manager = PullManager(self.client, path=self.directory, **options)
+        self.addCleanup(manager.close)
+        return manager
+
+    def test_single_pull_per_image(self):
+        manager = self.manager()
+        results = []
+        threads = [
+            threading.Thread(
+                target=lambda: results.extend(
+                    manager.pull_many(['busybox', 'busybox:latest', 'alpine'])
+                )
+            )
+            for _ in range(4)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(self.client.calls['pull'], 2)
+        self.assertEqual(
+            set(results),
+            {'busybox:latest', 'alpine:latest'}
+        )
+
+    def test_fresh_images_not_pulled(self):
+        self.manager().pull('busybox')
+        self.assertEqual(
+            self.manager(ttl=60).pull('busybox'),
+            'busybox:latest'
+        )
+        self.assertEqual(self.client.calls['pull'], 1)
+
+    def test_expired_images_pulled(self):
+        self.manager().pull('busybox')
+        self.manager(ttl=0).pull('busybox')
+        self.assertEqual(self.client.calls['pull'], 2)
+
+    def test_changed_images_pulled(self):
+        self.manager().pull('busybox')
+        self.client.images['busybox:latest']['Id'] = 'other-id'
+        self.assertEqual(self.manager(ttl=60).pull('busybox'), 'other-id')
+        self.assertEqual(self.client.calls['pull'], 2)
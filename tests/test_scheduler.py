@@ -0,0 +1,107 @@
+import unittest
+
+from docker_loader.image_definition import ImageDefinition
+from docker_loader.provisioner import Provisioner
+from docker_loader.provisioners.shell import ShellCommand
+from docker_loader.scheduler import Scheduler, dependency_graph
+
+from tests.stub_client import StubClient
+
+
+class RecordingProvisioner(Provisioner):
+
+    provisioned = []
+    skipped = []
+
+    def __init__(self, name):
+        self.name = name
+
+    def __str__(self):
+        return self.name
+
+    def provision(self, container):
+        self.provisioned.append(self.name)
+
+    def skip(self):
+        self.skipped.append(self.name)
+
+
+class BaseImage(ImageDefinition):
+    base = 'stub'
+    pull_base = False
+    provisioners = [
+        ShellCommand('true'),
+    ]
+
+
+class BrokenImage(BaseImage):
+    provisioners = [
+        ShellCommand('exit 1'),
+        RecordingProvisioner('broken'),
+    ]
+
+
+class WebImage(BaseImage):
+    base = 'acme/base'
+    provisioners = [
+        RecordingProvisioner('web'),
+    ]
+
+
+class WorkerImage(BaseImage):
+    base = 'acme/broken'
+    provisioners = [
+        RecordingProvisioner('worker'),
+    ]
+
+
+class DependencyGraphTestCase(unittest.TestCase):
+
+    def test_dependencies(self):
+        graph = dependency_graph({
+            'acme/base:latest': BaseImage(),
+            'acme/web:latest': WebImage(),
+        })
+        self.assertEqual(graph, {
+            'acme/base:latest': set(),
+            'acme/web:latest': {'acme/base:latest'},
+        })
+
+    def test_cycle(self):
+
+        class FirstImage(BaseImage):
+            base = 'acme/second'
+
+        class SecondImage(BaseImage):
+            base = 'acme/first'
+
+        self.assertRaises(ValueError, dependency_graph, {
+            'acme/first:latest': FirstImage(),
+            'acme/second:latest': SecondImage(),
+        })
+
+
+class SchedulerTestCase(unittest.TestCase):
+
+    def setUp(self):
+        del RecordingProvisioner.provisioned[:]
+        del RecordingProvisioner.skipped[:]
+
+    def test_failed_build_skips_dependants(self):
+        results = Scheduler(StubClient(), {
+            'acme/base': BaseImage,
+            'acme/web': WebImage,
+            'acme/broken': BrokenImage,
+            'acme/worker': WorkerImage,
+        }, concurrency=2).run()
+        self.assertTrue(results['acme/base:latest'].succeeded)
+        self.assertTrue(results['acme/web:latest'].succeeded)
+        self.assertFalse(results['acme/broken:latest'].succeeded)
+        self.assertFalse(results['acme/broken:latest'].skipped)
+        self.assertFalse(results['acme/worker:latest'].succeeded)
+        self.assertTrue(results['acme/worker:latest'].skipped)
+        self.assertEqual(RecordingProvisioner.provisioned, ['web'])
+        self.assertEqual(
+            sorted(RecordingProvisioner.skipped),
+            ['broken', 'worker']
+        )
@@ -0,0 +1,52 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from docker_loader.spool import Spool
+
+
+class SpoolTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def spool_command(self, spool, stdout, description='command'):
+        command = spool.command(description)
+        command.write(1, stdout)
+        command.close()
+        return command
+
+    def test_output(self):
+        spool = Spool(self.directory)
+        command = self.spool_command(spool, b'first\nsecond line\nthird\n')
+        output = command.output(1)
+        self.assertEqual(output, u'first\nsecond line\nthird\n')
+        self.assertEqual(list(output.grep('sec')), [u'second line'])
+        self.assertEqual(output.tail(6), u'third\n')
+        self.assertEqual(command.output(2), u'')
+        output.close()
+
+    def test_budget(self):
+        spool = Spool(self.directory, budget=10)
+        first = self.spool_command(spool, b'x' * 8)
+        second = self.spool_command(spool, b'y' * 8)
+        self.assertEqual(spool.commands, [second])
+        self.assertFalse(os.path.exists(first.path))
+        self.assertTrue(os.path.exists(second.path))
+
+    def test_reopened_directory(self):
+        spool = Spool(self.directory)
+        first = self.spool_command(spool, b'x' * 8)
+        spool = Spool(self.directory, budget=10)
+        self.assertEqual(len(spool), 1)
+        second = self.spool_command(spool, b'y' * 8)
+        self.assertNotEqual(first.path, second.path)
+        self.assertEqual([command.path for command in spool.commands], [
+            second.path,
+        ])
+        self.assertFalse(os.path.exists(first.path))
+        self.assertEqual(second.output(1), u'y' * 8)
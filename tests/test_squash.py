@@ -0,0 +1,66 @@
+import unittest
+
+from docker_loader.builder import Builder
+from docker_loader.image_definition import ImageDefinition
+from docker_loader.provisioners.shell import ShellCommand
+from docker_loader.report import BuildReport
+
+from tests.stub_client import StubClient
+
+
+class SquashedImage(ImageDefinition):
+    base = 'stub'
+    pull_base = False
+    squash = True
+    provisioners = [
+        ShellCommand('true'),
+    ]
+
+
+class LayeredClient(StubClient):
+    """Commits images taking 300 bytes with their parents."""
+
+    def commit(self, container, **options):
+        result = StubClient.commit(self, container, **options)
+        self.images[result['Id']]['VirtualSize'] = 300
+        self.images[result['Id']]['Size'] = 300
+        return result
+
+
+class SizeOnlyClient(LayeredClient):
+    """Reports image sizes as newer daemons do, without VirtualSize."""
+
+    def inspect_image(self, image):
+        inspection = dict(StubClient.inspect_image(self, image))
+        inspection.pop('VirtualSize', None)
+        return inspection
+
+
+class SquashTestCase(unittest.TestCase):
+
+    def squash_step(self, client):
+        report = BuildReport()
+        image = Builder(client, SquashedImage(), report=report).run(
+            output=lambda stream, data: None
+        )
+        self.assertTrue(image.id.startswith('sha256:'))
+        return [step for step in report.steps if step['kind'] == 'squash'][0]
+
+    def test_size_saved(self):
+        client = LayeredClient(image_size=100)
+        self.assertEqual(self.squash_step(client)['size_saved'], 200)
+
+    def test_size_without_virtual_size(self):
+        client = SizeOnlyClient(image_size=100)
+        self.assertEqual(self.squash_step(client)['size_saved'], 200)
+
+    def test_size_missing(self):
+
+        class SizelessClient(SizeOnlyClient):
+
+            def inspect_image(self, image):
+                inspection = SizeOnlyClient.inspect_image(self, image)
+                inspection.pop('Size', None)
+                return inspection
+
+        self.assertIsNone(self.squash_step(SizelessClient())['size_saved'])
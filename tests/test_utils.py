@@ -0,0 +1,56 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from docker_loader.utils import RingBuffer, read_json, write_json
+
+
+class RingBufferTestCase(unittest.TestCase):
+
+    def test_unbounded(self):
+        buffer = RingBuffer()
+        for chunk in (b'first ', b'', b'second'):
+            buffer.write(chunk)
+        self.assertEqual(buffer.getvalue(), b'first second')
+        self.assertEqual(len(buffer), 12)
+        self.assertEqual(buffer.dropped, 0)
+
+    def test_keeps_last_bytes(self):
+        buffer = RingBuffer(5)
+        buffer.write(b'abc')
+        buffer.write(b'defg')
+        self.assertEqual(buffer.getvalue(), b'cdefg')
+        buffer.write(b'0123456789')
+        self.assertEqual(buffer.getvalue(), b'56789')
+        self.assertEqual(len(buffer), 5)
+        self.assertEqual(buffer.dropped, 12)
+
+
+class JSONFileTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.working_directory = os.getcwd()
+
+    def tearDown(self):
+        os.chdir(self.working_directory)
+        shutil.rmtree(self.directory)
+
+    def test_missing_directories_created(self):
+        path = os.path.join(self.directory, 'nested', 'data.json')
+        write_json(path, {'key': [1, 2]})
+        self.assertEqual(read_json(path), {'key': [1, 2]})
+
+    def test_bare_file_name(self):
+        os.chdir(self.directory)
+        write_json('report.json', {'key': 'value'})
+        self.assertEqual(
+            read_json(os.path.join(self.directory, 'report.json')),
+            {'key': 'value'}
+        )
+        self.assertEqual(os.listdir(self.directory), ['report.json'])
+
+    def test_read_default(self):
+        path = os.path.join(self.directory, 'missing.json')
+        self.assertEqual(read_json(path, {}), {})
@@ -0,0 +1,106 @@
+import unittest
+
+from docker_loader import validation
+from docker_loader.image_definition import ImageDefinition
+from docker_loader.provisioners.shell import ShellCommand
+
+
+class ValidImage(ImageDefinition):
+    base = 'stub'
+    exposed_ports = [
+        (80, 'tcp'),
+    ]
+    provisioners = [
+        ShellCommand('true'),
+    ]
+
+
+class InvalidImage(ValidImage):
+    base = ''
+    exposed_ports = [
+        (80, 'sctp'),
+        (0, 'udp'),
+    ]
+    environment = {'LANG': 1}
+    provisioners = [
+        'true',
+    ]
+
+
+class ValidateAllTestCase(unittest.TestCase):
+
+    def errors(self, definitions):
+        with self.assertRaises(validation.ValidationError) as context:
+            validation.validate_all(definitions)
+        return context.exception.errors
+
+    def test_valid(self):
+        validation.validate_all({'acme/valid': ValidImage})
+        validation.validate_all([ValidImage(), ValidImage])
+
+    def test_all_errors_reported(self):
+        paths = [path for path, message in self.errors({
+            'acme/valid': ValidImage,
+            'acme/invalid': InvalidImage,
+        })]
+        self.assertEqual(paths, [
+            'acme/invalid: base',
+            'acme/invalid: exposed_ports[0][1]',
+            'acme/invalid: exposed_ports[1][0]',
+            "acme/invalid: environment['LANG']",
+            'acme/invalid: provisioners[0]',
+        ])
+
+    def test_sequence_prefixes(self):
+        paths = [path for path, message in self.errors([
+            ValidImage,
+            InvalidImage(),
+        ])]
+        self.assertTrue(all(path.startswith('1: ') for path in paths))
+
+    def test_missing_build_volume(self):
+
+        class VolumeImage(ValidImage):
+            build_volumes = {
+                '/nonexistent/volume': {'bind': '/volume', 'mode': 'rw'},
+            }
+
+        self.assertEqual(self.errors([VolumeImage]), [
+            (
+                "0: build_volumes['/nonexistent/volume']",
+                "host path /nonexistent/volume does not exist"
+            ),
+            (
+                "0: build_volumes['/nonexistent/volume']",
+                "unknown keys: 'mode'"
+            ),
+        ])
+
+    def test_missing_attribute(self):
+
+        class MissingImage(ValidImage):
+            _schema = (
+                ('server_name', validation.string),
+            )
+
+        self.assertEqual(
+            self.errors({'acme/web': MissingImage}),
+            [('acme/web: server_name', "missing")]
+        )
+
+    def test_disabled_check(self):
+
+        class UncheckedImage(InvalidImage):
+            _schema = (
+                ('base', None),
+                ('exposed_ports', None),
+                ('environment', None),
+                ('provisioners', None),
+            )
+
+        validation.validate_all([UncheckedImage])
+
+    def test_message(self):
+        errors = self.errors([InvalidImage])
+        error = validation.ValidationError(errors)
+        self.assertIn("0: base: must not be empty", str(error))